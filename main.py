@@ -10,13 +10,15 @@ import logging
 import threading
 import time
 from datetime import datetime
-from src import Config, ParkingMonitor, start_web_server, update_camera_frame, set_parking_monitor, SlackIntegration
+from src import Config, ParkingMonitor, start_web_server, update_camera_frame, set_parking_monitor, has_viewer
 
 class ParkingEnforcerApp:
     def __init__(self):
         self.parking_monitor = None
         self.web_server_thread = None
         self.is_running = False
+        self._stop_event = threading.Event()
+        self._next_health_log = 0
         
         # Setup logging
         self.setup_logging()
@@ -68,9 +70,10 @@ class ParkingEnforcerApp:
                     print("The camera may be in use by other processes.")
                     print("The web interface will still work for viewing parking data.\n")
                 else:
-                    # Test if camera is actually working by trying to read a frame
+                    # Test if camera is actually working by waiting for a frame from the
+                    # running capture thread rather than copying one out separately
                     try:
-                        test_frame = self.parking_monitor.camera.capture_array()
+                        test_frame = self.parking_monitor.get_frame(timeout=2.0)
                         if test_frame is None or test_frame.size == 0:
                             self.logger.warning("Camera opened but cannot read frames - may be in use by other processes")
                             print("\n⚠️  Camera opened but cannot read frames!")
@@ -78,6 +81,7 @@ class ParkingEnforcerApp:
                             print("The web interface will still work for viewing parking data.\n")
                         else:
                             print(f"✅ Camera working! Frame shape: {test_frame.shape}")
+                        self.parking_monitor.release_frame(test_frame)
                     except Exception as e:
                         self.logger.warning(f"Camera test failed: {e}")
                         print("\n⚠️  Camera test failed!")
@@ -107,44 +111,41 @@ class ParkingEnforcerApp:
         """Main application loop"""
         self.logger.info("Entering main application loop")
         
-        last_frame_update = 0
-        frame_update_interval = 0.1  # Update frames at 10 FPS for web interface
+        last_read_failure_log = 0
         
         while self.is_running:
             try:
-                current_time = time.time()
-                
-                # Update camera frame for web interface at higher frequency
-                if current_time - last_frame_update >= frame_update_interval:
-                    if self.parking_monitor and self.parking_monitor.camera:
-                        ret, frame = self.parking_monitor.read_frame()
-                        if ret:
-                            # Annotate frame with car detections and patrol region
-                            detections = self.parking_monitor.car_detector.detect_cars_in_frame(frame)
-                            annotated_frame = self.parking_monitor.car_detector.draw_detections_on_frame(frame, detections)
-                            update_camera_frame(annotated_frame)
-                        else:
-                            # Log camera read failures less frequently
-                            if int(current_time) % 30 == 0:  # Every 30 seconds
-                                self.logger.warning("Camera frame read failed - this may be normal if no camera is connected")
+                if self.parking_monitor and self.parking_monitor.camera:
+                    # Block until the capture thread delivers a frame
+                    frame = self.parking_monitor.get_frame(timeout=1.0)
+                    if frame is None:
+                        # Log camera read failures at most every 30 seconds
+                        if time.monotonic() - last_read_failure_log > 30:
+                            self.logger.warning("Camera frame read failed - this may be normal if no camera is connected")
+                            last_read_failure_log = time.monotonic()
+                    elif has_viewer():
+                        # Overlay the monitor thread's latest detections instead of running
+                        # the detector again for every preview frame; skipped when nobody watches
+                        detections = self.parking_monitor.get_latest_detections()
+                        annotated_frame = self.parking_monitor.car_detector.draw_detections_on_frame(frame, detections, inplace=True)
+                        # The encoder hands the frame back to the capture pool when done with it
+                        update_camera_frame(annotated_frame, release=self.parking_monitor.release_frame)
                     else:
-                        # Camera not available, update with None to trigger fallback image
-                        update_camera_frame(None)
-                    
-                    last_frame_update = current_time
+                        self.parking_monitor.release_frame(frame)
+                else:
+                    # Camera not available, update with None to trigger fallback image
+                    update_camera_frame(None)
+                    self._stop_event.wait(1)
                 
                 # Check system health
                 self.check_system_health()
                 
-                # Sleep for a short interval
-                time.sleep(0.05)  # 20 FPS for main loop
-                
             except KeyboardInterrupt:
                 self.logger.info("Keyboard interrupt received")
                 break
             except Exception as e:
                 self.logger.error(f"Error in main loop: {e}")
-                time.sleep(5)  # Wait before retrying
+                self._stop_event.wait(5)  # Wait before retrying
     
     def check_system_health(self):
         """Check system health and send alerts if needed"""
@@ -155,14 +156,16 @@ class ParkingEnforcerApp:
         # - Database health checks
         
         # For now, just log that we're running
-        if int(time.time()) % 300 == 0:  # Every 5 minutes
+        if time.monotonic() >= self._next_health_log:  # Every 5 minutes
             self.logger.info("System health check - All systems operational")
+            self._next_health_log = time.monotonic() + 300
     
     def shutdown(self):
         """Gracefully shutdown the application"""
         self.logger.info("Shutting down Pi Parking Enforcer...")
         
         self.is_running = False
+        self._stop_event.set()
         
         # Stop parking monitoring
         if self.parking_monitor:
@@ -139,6 +139,24 @@ def download_yolo_model():
         print("⚠️ Model will be downloaded on first run")
         return True
 
+def export_tensorrt_engine():
+    """Export the YOLO model to a TensorRT FP16 engine on NVIDIA hardware"""
+    if not (shutil.which("nvidia-smi") or os.path.exists("/etc/nv_tegra_release")):
+        print("🔄 No NVIDIA GPU detected, skipping TensorRT export")
+        return True
+    
+    if os.name == 'nt':  # Windows
+        python_path = ".venv\\Scripts\\python"
+    else:  # Unix/Linux
+        python_path = ".venv/bin/python"
+    
+    command = f"{python_path} -m src.model_export"
+    if run_command(command, "Exporting YOLO model to TensorRT FP16 engine"):
+        print("📝 Set USE_TENSORRT=True in .env to use yolov8n.engine")
+    else:
+        print("⚠️ TensorRT export failed, the PyTorch model will be used")
+    return True
+
 def main():
     """Main setup function"""
     print("=" * 60)
@@ -189,6 +207,7 @@ def main():
     # Download YOLO model
     print("\n🤖 Setting up AI model...")
     download_yolo_model()
+    export_tensorrt_engine()
     
     print("\n" + "=" * 60)
     print("✅ Setup completed successfully!")
@@ -1,9 +1,13 @@
+from typing import TYPE_CHECKING
+
 from .config import Config
-from .parking_monitor import ParkingMonitor
-from .web_interface import start_web_server, update_camera_frame, set_parking_monitor
-from .slack_integration import SlackIntegration
-from .database import ParkingDatabase
-from .car_detector import CarDetector
+
+if TYPE_CHECKING:
+    from .parking_monitor import ParkingMonitor
+    from .web_interface import start_web_server, update_camera_frame, set_parking_monitor, has_viewer
+    from .slack_integration import SlackIntegration
+    from .database import ParkingDatabase
+    from .car_detector import CarDetector, MotionGate
 
 __all__ = [
     "Config",
@@ -11,7 +15,33 @@ __all__ = [
     "start_web_server",
     "update_camera_frame",
     "set_parking_monitor",
+    "has_viewer",
     "SlackIntegration",
     "ParkingDatabase",
     "CarDetector",
+    "MotionGate",
 ]
+
+# Everything but Config is imported on first access (PEP 562), so tools that only
+# need Config or the database don't pay for ultralytics/torch, Flask or slack_sdk
+_LAZY_IMPORTS = {
+    "ParkingMonitor": ".parking_monitor",
+    "start_web_server": ".web_interface",
+    "update_camera_frame": ".web_interface",
+    "set_parking_monitor": ".web_interface",
+    "has_viewer": ".web_interface",
+    "SlackIntegration": ".slack_integration",
+    "ParkingDatabase": ".database",
+    "CarDetector": ".car_detector",
+    "MotionGate": ".car_detector",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
@@ -3,20 +3,134 @@ import numpy as np
 from ultralytics import YOLO
 from typing import List, Dict, Tuple, Optional
 import os
+import heapq
+import logging
+import queue
+import threading
+import time
 from datetime import datetime
 from .config import Config
 import uuid
 
 class CarDetector:
+    # Backends that load a model exported by src.model_export through Ultralytics
+    EXPORTED_BACKENDS = ('ncnn', 'openvino', 'onnxruntime', 'tflite')
+    
+    # Empty frames needed before a spot's baseline is trusted, and its averaging window
+    EMPTY_BASELINE_MIN_SAMPLES = 20
+    EMPTY_BASELINE_WINDOW = 100
+    
+    # Alert images are downscaled to this width before encoding
+    ALERT_IMAGE_MAX_WIDTH = 640
+    
     def __init__(self):
-        self.model = YOLO(Config.CAR_DETECTION_MODEL)
         self.confidence_threshold = Config.CONFIDENCE_THRESHOLD
         
+        # Native TensorRT runner with persistent buffers, or the Ultralytics wrapper
+        self.trt_runner = None
+        self.model = None
+        model_path = self._select_model_path()
+        if Config.USE_NATIVE_TENSORRT and model_path.endswith('.engine'):
+            from .trt_detector import TRTDetector
+            self.trt_runner = TRTDetector(model_path, max_batch=max(1, len(Config.PARKING_SPOTS)),
+                                          conf_threshold=self.confidence_threshold)
+        else:
+            self.model = YOLO(model_path, task='detect')
+        # Exported NCNN/OpenVINO/ONNX models take one image per call
+        self.single_image_model = self.model is not None and not model_path.endswith(('.pt', '.engine'))
+        # Run PyTorch weights in FP16 on a CUDA GPU; engines carry their own precision
+        self._half = False
+        if self.model is not None and model_path.endswith('.pt'):
+            import torch
+            self._half = torch.cuda.is_available()
+        
         # Create image storage directory
         os.makedirs(Config.IMAGE_STORAGE_PATH, exist_ok=True)
         
         # Car class IDs in COCO dataset (car=2, truck=7, bus=5)
         self.car_classes = [2, 7, 5]
+        
+        # Reusable per-spot image buffers for save_spot_image, keyed by spot coords
+        self._spot_buffers = {}
+        
+        # Spot images are written to disk by a background thread so slow SD-card
+        # writes never stall detection; when the queue is full new images are dropped
+        self._write_q = queue.Queue(maxsize=64)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        
+        # Cleanup runs once enough new images have been saved, at most once a minute
+        # (elapsed time on the monotonic clock, immune to NTP steps at boot)
+        self._saved_since_cleanup = 0
+        self._last_cleanup_ts = float('-inf')
+        
+        # Next time a clean full frame is kept for INT8 calibration
+        self._next_calibration_ts = float('-inf')
+        
+        # Per-spot (mean variance, samples) of frames where the spot was empty
+        self._empty_baseline = {}
+        
+        # Patrol quadrilateral bounding rects, keyed by region and frame size
+        self._patrol_plans = {}
+        
+        # The patrol region is static, so classify it once: 'quad', 'rect' or None
+        self._patrol_region = getattr(Config, 'PATROL_REGION', None)
+        self._patrol_kind = None
+        self._patrol_polygon = None  # float32 points for pointPolygonTest
+        if self._patrol_region:
+            if self._is_quadrilateral_region(self._patrol_region):
+                self._patrol_kind = 'quad'
+                self._patrol_polygon = np.array(self._patrol_region, np.float32)
+            elif self._is_rectangle_region(self._patrol_region):
+                self._patrol_kind = 'rect'
+        
+        # Persistent letterboxed input batch for the Ultralytics path
+        self._batch = None
+        self._batch_rois = []
+        self._letterbox_plans = {}
+        
+        # Letterbox spot ROIs on the GPU (Jetson) instead of in YOLO's CPU preprocessing
+        self.use_cuda_preprocess = Config.USE_CUDA_PREPROCESS and self._cuda_available()
+        if self.use_cuda_preprocess:
+            self._g_frame = cv2.cuda_GpuMat()
+    
+    def _select_model_path(self) -> str:
+        """Use the TensorRT engine or an exported CPU model when enabled and built, otherwise the PyTorch weights"""
+        if Config.USE_TENSORRT:
+            if os.path.exists(Config.CAR_DETECTION_MODEL_ENGINE):
+                return Config.CAR_DETECTION_MODEL_ENGINE
+            logging.warning(f"TensorRT engine {Config.CAR_DETECTION_MODEL_ENGINE} not found, "
+                            f"falling back to {Config.CAR_DETECTION_MODEL}")
+        
+        if Config.DETECTOR_BACKEND in self.EXPORTED_BACKENDS:
+            candidates = self.exported_model_paths(Config.DETECTOR_BACKEND)
+            for path in candidates:
+                if os.path.exists(path):
+                    return path
+            logging.warning(f"No {Config.DETECTOR_BACKEND} model found at {candidates[0]}, "
+                            f"falling back to {Config.CAR_DETECTION_MODEL}")
+        return Config.CAR_DETECTION_MODEL
+    
+    @staticmethod
+    def exported_model_paths(backend: str) -> List[str]:
+        """Paths where Ultralytics exports CAR_DETECTION_MODEL for a backend, preferred first"""
+        stem = os.path.splitext(Config.CAR_DETECTION_MODEL)[0]
+        name = os.path.basename(stem)
+        return {
+            'ncnn': [f"{stem}_ncnn_model"],
+            'openvino': [f"{stem}_int8_openvino_model", f"{stem}_openvino_model"],
+            'onnxruntime': [f"{stem}.onnx"],
+            'tflite': [os.path.join(f"{stem}_saved_model", f"{name}_int8.tflite"),
+                       os.path.join(f"{stem}_saved_model", f"{name}_float16.tflite")],
+        }[backend]
+    
+    @staticmethod
+    def _cuda_available() -> bool:
+        """Check whether OpenCV was built with CUDA and a device is present"""
+        try:
+            return cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except (AttributeError, cv2.error):
+            return False
     
     def _is_quadrilateral_region(self, patrol_region) -> bool:
         """Check if patrol region is a quadrilateral (list of 4 points)"""
@@ -27,50 +141,57 @@ class CarDetector:
         return isinstance(patrol_region, tuple) and len(patrol_region) == 4
     
     def _crop_to_quadrilateral(self, frame: np.ndarray, points: List[Tuple[int, int]]) -> Tuple[np.ndarray, Tuple[int, int]]:
-        """Crop frame to quadrilateral region and return cropped frame with offset"""
-        # Convert points to numpy array
+        """Crop frame to the quadrilateral's bounding rectangle and return the crop with its offset.
+        Pixels outside the polygon are only blacked out when MASK_PATROL_POLYGON is set;
+        detections are filtered by _detections_in_polygon either way"""
+        # The patrol region is fixed, so its bounding rect is computed once per frame size
+        key = (tuple(map(tuple, points)), frame.shape[:2])
+        if key not in self._patrol_plans:
+            self._patrol_plans[key] = self._build_patrol_plan(frame.shape[:2], points, Config.MASK_PATROL_POLYGON)
+        plan = self._patrol_plans[key]
+        
+        if plan is None:
+            # Return empty frame if region is invalid
+            return np.zeros((1, 1, frame.shape[2] if len(frame.shape) == 3 else 1), dtype=frame.dtype), (0, 0)
+        
+        x, y, w, h, mask = plan
+        cropped = frame[y:y+h, x:x+w]
+        if mask is not None:
+            cropped = cv2.bitwise_and(cropped, cropped, mask=mask)
+        return cropped, (x, y)
+    
+    @staticmethod
+    def _build_patrol_plan(frame_size: Tuple[int, int], points: List[Tuple[int, int]], with_mask: bool = False):
+        """Bounding rect (x, y, w, h) of a quadrilateral clipped to the frame plus its polygon
+        mask (None unless with_mask), or None if the rect is empty"""
         pts = np.array(points, np.int32)
         
-        # Get bounding rectangle of the quadrilateral
+        # Get bounding rectangle of the quadrilateral, within frame bounds
         x, y, w, h = cv2.boundingRect(pts)
-        
-        # Ensure coordinates are within frame bounds
         x = max(0, x)
         y = max(0, y)
-        w = min(w, frame.shape[1] - x)
-        h = min(h, frame.shape[0] - y)
-        
-        # Check if the region is valid
+        w = min(w, frame_size[1] - x)
+        h = min(h, frame_size[0] - y)
         if w <= 0 or h <= 0:
-            # Return empty frame if region is invalid
-            return np.zeros((1, 1, frame.shape[2] if len(frame.shape) == 3 else 1), dtype=frame.dtype), (0, 0)
-        
-        # Crop to bounding rectangle
-        cropped = frame[y:y+h, x:x+w]
-        
-        # Check if cropped frame is valid
-        if cropped.size == 0:
-            return np.zeros((1, 1, frame.shape[2] if len(frame.shape) == 3 else 1), dtype=frame.dtype), (0, 0)
-        
-        # Create mask for the quadrilateral
-        mask = np.zeros((h, w), dtype=np.uint8)
-        # Adjust points relative to bounding rectangle
-        adjusted_pts = pts - np.array([x, y])
-        cv2.fillPoly(mask, [adjusted_pts], 255)
-        
-        # Apply mask to cropped frame
-        if len(cropped.shape) == 3:
-            # Ensure mask has the same number of channels as the frame
-            if cropped.shape[2] == 4:  # RGBA
-                mask_4d = np.stack([mask] * 4, axis=2)
-                masked_frame = cv2.bitwise_and(cropped, mask_4d)
-            else:  # RGB
-                mask_3d = np.stack([mask] * 3, axis=2)
-                masked_frame = cv2.bitwise_and(cropped, mask_3d)
-        else:
-            masked_frame = cv2.bitwise_and(cropped, mask)
+            return None
         
-        return masked_frame, (x, y)
+        mask = None
+        if with_mask:
+            mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(mask, [pts - (x, y)], 255)
+        return x, y, w, h, mask
+    
+    @staticmethod
+    def _detections_in_polygon(detections: List[Dict], points: List[Tuple[int, int]]) -> List[Dict]:
+        """Keep detections whose box centre lies inside the polygon (full-frame coordinates)"""
+        if not detections:
+            return detections
+        pts = np.asarray(points, np.float32)
+        return [
+            detection for detection in detections
+            if cv2.pointPolygonTest(pts, ((detection['bbox'][0] + detection['bbox'][2]) / 2,
+                                          (detection['bbox'][1] + detection['bbox'][3]) / 2), False) >= 0
+        ]
     
     def _draw_quadrilateral(self, frame: np.ndarray, points: List[Tuple[int, int]], color: Tuple[int, int, int] = (255, 0, 0), thickness: int = 2):
         """Draw quadrilateral outline on frame"""
@@ -80,45 +201,196 @@ class CarDetector:
     def detect_cars_in_frame(self, frame: np.ndarray) -> List[Dict]:
         """Detect cars in the entire frame or patrol region if specified"""
         # Use patrol region if specified
-        patrol_region = getattr(Config, 'PATROL_REGION', None)
-        if patrol_region:
-            if self._is_quadrilateral_region(patrol_region):
-                # Handle quadrilateral region
-                frame, region_offset = self._crop_to_quadrilateral(frame, patrol_region)
-            elif self._is_rectangle_region(patrol_region):
-                # Handle rectangle region (backward compatibility)
-                x, y, w, h = patrol_region
-                frame = frame[y:y+h, x:x+w]
-                region_offset = (x, y)
-            else:
-                # Invalid patrol region format
-                region_offset = (0, 0)
+        if self._patrol_kind == 'quad':
+            # Handle quadrilateral region: detect in its bounding rectangle, then keep
+            # only detections centred inside it
+            frame, region_offset = self._crop_to_quadrilateral(frame, self._patrol_region)
+        elif self._patrol_kind == 'rect':
+            # Handle rectangle region (backward compatibility)
+            x, y, w, h = self._patrol_region
+            frame = frame[y:y+h, x:x+w]
+            region_offset = (x, y)
         else:
+            # No patrol region, or an invalid format
             region_offset = (0, 0)
-        # Convert RGBA to RGB if needed for YOLO model
-        if frame.shape[2] == 4:  # RGBA
-            frame_rgb = frame[:, :, :3]  # Drop alpha channel
+        # The camera delivers 3-channel BGR (RGB888), which the model takes as-is
+        if frame.size == 0:
+            return []
+        
+        if self.model is not None:
+            # Letterbox once into the persistent input batch and run the model on it as a tensor
+            import torch
+            h, w = frame.shape[:2]
+            batch, ((scale, pad),) = self._letterbox_rois_into_batch(frame, [(0, 0, w, h)])
+            xyxy, confs, classes = self._run_model(torch.from_numpy(batch))[0]
+            detections = self._filter_detections(xyxy, confs, classes, region_offset, scale, pad)
+        else:
+            xyxy, confs, classes = self._run_model([frame])[0]
+            detections = self._filter_detections(xyxy, confs, classes, region_offset)
+        
+        if self._patrol_polygon is not None:
+            detections = self._detections_in_polygon(detections, self._patrol_polygon)
+        return detections
+    
+    def _run_model(self, images: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Run the detector on a batch of images, returning (xyxy, conf, cls) arrays per image"""
+        if self.trt_runner:
+            return self.trt_runner.infer(images)
+        
+        # Let NMS drop non-car classes and low-confidence boxes before they reach Python
+        predict_args = {'imgsz': Config.DETECTION_IMAGE_SIZE, 'classes': self.car_classes,
+                        'conf': self.confidence_threshold, 'half': self._half, 'verbose': False}
+        if self.single_image_model:
+            results = [self.model(images[k:k+1], **predict_args)[0] for k in range(len(images))]
         else:
-            frame_rgb = frame
-        results = self.model(frame_rgb, verbose=False)
-        detections = []
+            results = self.model(images, **predict_args)
+        
+        outputs = []
         for result in results:
             boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Check if detection is a car/truck/bus
-                    if int(box.cls[0]) in self.car_classes:
-                        confidence = float(box.conf[0])
-                        if confidence >= self.confidence_threshold:
-                            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                            # Adjust for patrol region offset
-                            x1, y1, x2, y2 = int(x1 + region_offset[0]), int(y1 + region_offset[1]), int(x2 + region_offset[0]), int(y2 + region_offset[1])
-                            detections.append({
-                                'bbox': (x1, y1, x2, y2),
-                                'confidence': confidence,
-                                'class_id': int(box.cls[0])
-                            })
-        return detections
+            if boxes is None or len(boxes) == 0:
+                outputs.append((np.empty((0, 4)), np.empty(0), np.empty(0, dtype=int)))
+                continue
+            # One device->host transfer per tensor instead of one per box
+            outputs.append((boxes.xyxy.cpu().numpy(),
+                            boxes.conf.cpu().numpy(),
+                            boxes.cls.cpu().numpy().astype(int)))
+        return outputs
+    
+    def _filter_detections(self, xyxy: np.ndarray, confs: np.ndarray, classes: np.ndarray,
+                           offset: Tuple[int, int], scale: float = 1.0,
+                           pad: Tuple[int, int] = (0, 0)) -> List[Dict]:
+        """Keep car detections and map their boxes back to frame coordinates"""
+        # Keep cars/trucks/buses above the confidence threshold
+        mask = np.isin(classes, self.car_classes) & (confs >= self.confidence_threshold)
+        
+        # Undo any letterboxing, then shift into frame coordinates
+        xyxy = (xyxy[mask] - np.array([pad[0], pad[1], pad[0], pad[1]])) / scale
+        xyxy += np.array([offset[0], offset[1], offset[0], offset[1]])
+        
+        return [
+            {
+                'bbox': (int(x1), int(y1), int(x2), int(y2)),
+                'confidence': float(conf),
+                'class_id': int(cls)
+            }
+            for (x1, y1, x2, y2), conf, cls in zip(xyxy, confs[mask], classes[mask])
+        ]
+    
+    def detect_cars_in_spots_batched(self, frame: np.ndarray,
+                                     spot_coords_list: List[Tuple[int, int, int, int]]) -> List[List[Dict]]:
+        """Detect cars in several parking spots with a single batched YOLO call"""
+        spot_detections = [[] for _ in spot_coords_list]
+        frame_h, frame_w = frame.shape[:2]
+        
+        # Clip spot rectangles to the frame and drop empty ones
+        spots = []
+        for i, (x, y, w, h) in enumerate(spot_coords_list):
+            w = min(w, frame_w - x)
+            h = min(h, frame_h - y)
+            if w > 0 and h > 0:
+                spots.append((i, x, y, w, h))
+        
+        if not spots:
+            return spot_detections
+        
+        if self.use_cuda_preprocess:
+            letterboxed = self._letterbox_rois_cuda(frame, [(x, y, w, h) for _, x, y, w, h in spots])
+            outputs = self._run_model([image for image, _, _ in letterboxed])
+            for (i, x, y, _, _), (_, scale, pad), output in zip(spots, letterboxed, outputs):
+                spot_detections[i] = self._filter_detections(*output, (x, y), scale, pad)
+        elif self.model is not None:
+            import torch
+            batch, transforms = self._letterbox_rois_into_batch(frame, [(x, y, w, h) for _, x, y, w, h in spots])
+            outputs = self._run_model(torch.from_numpy(batch))
+            for (i, x, y, _, _), (scale, pad), output in zip(spots, transforms, outputs):
+                spot_detections[i] = self._filter_detections(*output, (x, y), scale, pad)
+        else:
+            # TRTDetector letterboxes straight into its pinned input buffers
+            outputs = self._run_model([frame[y:y+h, x:x+w] for _, x, y, w, h in spots])
+            for (i, x, y, _, _), output in zip(spots, outputs):
+                spot_detections[i] = self._filter_detections(*output, (x, y))
+        
+        return spot_detections
+    
+    def _letterbox_rois_into_batch(self, frame: np.ndarray, rois: List[Tuple[int, int, int, int]],
+                                   size: int = Config.DETECTION_IMAGE_SIZE) -> Tuple[np.ndarray, List[Tuple[float, Tuple[int, int]]]]:
+        """Letterbox ROIs into the persistent (N, 3, size, size) RGB input batch"""
+        # Spots are fixed, so each ROI's scale, padding and resize buffer are computed once
+        if self._batch is None or len(self._batch) < len(rois):
+            self._batch = np.full((max(len(rois), len(Config.PARKING_SPOTS)), 3, size, size),
+                                  114 / 255.0, dtype=np.float32)
+            self._batch_rois = [None] * len(self._batch)
+        
+        transforms = []
+        for i, (x, y, w, h) in enumerate(rois):
+            plan = self._letterbox_plans.get((x, y, w, h))
+            if plan is None:
+                scale = size / max(w, h)
+                new_w, new_h = int(round(w * scale)), int(round(h * scale))
+                plan = (scale, ((size - new_w) // 2, (size - new_h) // 2),
+                        np.empty((new_h, new_w, 3), dtype=np.uint8))
+                self._letterbox_plans[(x, y, w, h)] = plan
+            scale, (pad_x, pad_y), resized = plan
+            new_h, new_w = resized.shape[:2]
+            
+            # Refill the padding when this slot last held a different ROI
+            if self._batch_rois[i] != (x, y, w, h):
+                self._batch[i].fill(114 / 255.0)
+                self._batch_rois[i] = (x, y, w, h)
+            
+            cv2.resize(frame[y:y+h, x:x+w], (new_w, new_h), dst=resized, interpolation=cv2.INTER_LINEAR)
+            # BGR -> RGB, HWC -> CHW and 0-255 -> 0-1, as YOLO expects of tensor input
+            self._batch[i, :, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized[:, :, ::-1].transpose(2, 0, 1) * (1 / 255.0)
+            transforms.append((scale, (pad_x, pad_y)))
+        
+        return self._batch[:len(rois)], transforms
+    
+    def _letterbox_rois_cuda(self, frame: np.ndarray, rois: List[Tuple[int, int, int, int]],
+                             size: int = Config.DETECTION_IMAGE_SIZE) -> List[Tuple[np.ndarray, float, Tuple[int, int]]]:
+        """Letterbox ROIs to size x size on the GPU, returning each image with its scale and padding"""
+        # Upload the frame once and take every ROI as a view on the device
+        self._g_frame.upload(np.ascontiguousarray(frame))
+        
+        letterboxed = []
+        for x, y, w, h in rois:
+            roi = self._g_frame.rowRange(y, y + h).colRange(x, x + w)
+            scale = size / max(w, h)
+            new_w, new_h = int(round(w * scale)), int(round(h * scale))
+            resized = cv2.cuda.resize(roi, (new_w, new_h))
+            pad_x = (size - new_w) // 2
+            pad_y = (size - new_h) // 2
+            padded = cv2.cuda.copyMakeBorder(resized, pad_y, size - new_h - pad_y,
+                                             pad_x, size - new_w - pad_x,
+                                             cv2.BORDER_CONSTANT, value=(114, 114, 114))
+            letterboxed.append((padded.download(), scale, (pad_x, pad_y)))
+        
+        return letterboxed
+    
+    @staticmethod
+    def _batched_iou(boxes: np.ndarray, spot_boxes: np.ndarray) -> np.ndarray:
+        """IoU of every (x1, y1, x2, y2) box against every (x, y, w, h) spot, shape (N_boxes, N_spots)"""
+        spot_xyxy = np.concatenate([spot_boxes[:, :2], spot_boxes[:, :2] + spot_boxes[:, 2:]], axis=1)
+        top_left = np.maximum(boxes[:, None, :2], spot_xyxy[None, :, :2])
+        bottom_right = np.minimum(boxes[:, None, 2:], spot_xyxy[None, :, 2:])
+        intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+        box_area = (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)
+        spot_area = spot_boxes[:, 2:].prod(axis=1)
+        union = box_area[:, None] + spot_area[None, :] - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+    
+    def assign_detections_to_spots(self, detections: List[Dict],
+                                   spot_coords_list,
+                                   iou_threshold: float = None) -> List[List[Dict]]:
+        """Group full-frame detections by the spots they overlap (spots as (x, y, w, h) tuples or an (N, 4) array)"""
+        if iou_threshold is None:
+            iou_threshold = Config.SPOT_IOU_THRESHOLD
+        if not detections:
+            return [[] for _ in spot_coords_list]
+        
+        boxes = np.array([detection['bbox'] for detection in detections], dtype=np.float32)
+        overlaps = self._batched_iou(boxes, np.asarray(spot_coords_list, dtype=np.float32)) > iou_threshold
+        return [[detections[k] for k in np.flatnonzero(overlaps[:, j])] for j in range(overlaps.shape[1])]
     
     def detect_cars_in_spot(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]) -> List[Dict]:
         """Detect cars in a specific parking spot"""
@@ -140,8 +412,43 @@ class CarDetector:
     
     def is_spot_occupied(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]) -> Tuple[bool, float, Optional[str]]:
         """Check if a parking spot is occupied by a car"""
-        detections = self.detect_cars_in_spot(frame, spot_coords)
+        if Config.EMPTY_BASELINE_ENABLED and self.matches_empty_baseline(frame, spot_coords):
+            return False, 0.0, None
         
+        detections = self.detect_cars_in_spot(frame, spot_coords)
+        result = self.spot_occupancy_from_detections(frame, spot_coords, detections)
+        if Config.EMPTY_BASELINE_ENABLED and not result[0]:
+            self.update_empty_baseline(frame, spot_coords)
+        return result
+    
+    def _spot_variance(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]) -> float:
+        """Pixel variance of the spot downscaled to 16x16, a cheap texture signature"""
+        x, y, w, h = spot_coords
+        small = cv2.resize(frame[y:y+h, x:x+w], (16, 16), interpolation=cv2.INTER_AREA)
+        return float(np.var(small, dtype=np.float32))
+    
+    def matches_empty_baseline(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]) -> bool:
+        """Check whether a spot still looks like its learned empty state"""
+        baseline = self._empty_baseline.get(spot_coords)
+        if baseline is None or baseline[1] < self.EMPTY_BASELINE_MIN_SAMPLES:
+            return False
+        
+        mean_variance = baseline[0]
+        variance = self._spot_variance(frame, spot_coords)
+        return abs(variance - mean_variance) <= Config.EMPTY_BASELINE_TOLERANCE * max(mean_variance, 1.0)
+    
+    def update_empty_baseline(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]):
+        """Fold a frame in which the detector found the spot empty into its baseline"""
+        variance = self._spot_variance(frame, spot_coords)
+        mean_variance, samples = self._empty_baseline.get(spot_coords, (variance, 0))
+        samples += 1
+        # Running mean for the first samples, then a moving average that follows lighting
+        mean_variance += (variance - mean_variance) / min(samples, self.EMPTY_BASELINE_WINDOW)
+        self._empty_baseline[spot_coords] = (mean_variance, samples)
+    
+    def spot_occupancy_from_detections(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int],
+                                       detections: List[Dict]) -> Tuple[bool, float, Optional[str]]:
+        """Decide spot occupancy from detections already made inside the spot"""
         if not detections:
             return False, 0.0, None
         
@@ -159,11 +466,13 @@ class CarDetector:
                        detection: Dict) -> str:
         """Save an image of the detected car in the parking spot"""
         x, y, w, h = spot_coords
-        spot_roi = frame[y:y+h, x:x+w].copy()
-        
-        # Convert RGBA to RGB if needed for saving
-        if spot_roi.shape[2] == 4:  # RGBA
-            spot_roi = spot_roi[:, :, :3]  # Drop alpha channel
+        # Copy into the spot's reusable buffer so the frame itself is not drawn on
+        spot_view = frame[y:y+h, x:x+w]
+        spot_roi = self._spot_buffers.get(spot_coords)
+        if spot_roi is None or spot_roi.shape != spot_view.shape:
+            spot_roi = np.empty(spot_view.shape, dtype=frame.dtype)
+            self._spot_buffers[spot_coords] = spot_roi
+        np.copyto(spot_roi, spot_view)
         
         # Add detection box to the image
         bbox = detection['bbox']
@@ -182,64 +491,119 @@ class CarDetector:
         filename = f"spot_{timestamp}_{unique_id}.jpg"
         filepath = os.path.join(Config.IMAGE_STORAGE_PATH, filename)
         
-        # Save image
-        cv2.imwrite(filepath, spot_roi)
+        # Encode in memory at quality 85 (roughly half the bytes of the default) and
+        # hand the bytes to the writer thread
+        ok, buf = cv2.imencode('.jpg', spot_roi, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if ok:
+            try:
+                self._write_q.put_nowait((filepath, buf))
+                self._saved_since_cleanup += 1
+            except queue.Full:
+                logging.warning(f"Image write queue full, dropping {filename}")
+        
+        if self._saved_since_cleanup > 50 and time.monotonic() - self._last_cleanup_ts > 60:
+            self.cleanup_old_images()
         return filepath
     
+    def save_calibration_frame(self, frame: np.ndarray):
+        """Periodically keep an unannotated full frame for INT8 calibration (see model_export)"""
+        if Config.CALIBRATION_FRAME_INTERVAL <= 0 or time.monotonic() < self._next_calibration_ts:
+            return
+        self._next_calibration_ts = time.monotonic() + Config.CALIBRATION_FRAME_INTERVAL
+        
+        filename = f"calib_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+        ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        if ok:
+            try:
+                self._write_q.put_nowait((os.path.join(Config.IMAGE_STORAGE_PATH, filename), buf))
+            except queue.Full:
+                logging.warning(f"Image write queue full, dropping {filename}")
+        
+        # Saves are rare, so prune the oldest calibration frames right here
+        try:
+            with os.scandir(Config.IMAGE_STORAGE_PATH) as entries:
+                files = [entry.name for entry in entries if entry.name.startswith('calib_')]
+        except FileNotFoundError:
+            return
+        for file in heapq.nsmallest(max(0, len(files) - Config.MAX_CALIBRATION_FRAMES), files):
+            try:
+                os.remove(os.path.join(Config.IMAGE_STORAGE_PATH, file))
+            except OSError:
+                pass
+    
+    def encode_alert_image(self, frame: np.ndarray, spot_coords: Tuple[int, int, int, int]) -> Optional[bytes]:
+        """Encode the spot as a small JPEG for alerts: at most ALERT_IMAGE_MAX_WIDTH wide, quality 80"""
+        x, y, w, h = spot_coords
+        image = frame[y:y+h, x:x+w]
+        if image.size == 0:
+            return None
+        h, w = image.shape[:2]
+        if w > self.ALERT_IMAGE_MAX_WIDTH:
+            size = (self.ALERT_IMAGE_MAX_WIDTH, max(1, round(h * self.ALERT_IMAGE_MAX_WIDTH / w)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return buf.tobytes() if ok else None
+    
+    def _writer_loop(self):
+        """Write encoded spot images queued by save_spot_image"""
+        while True:
+            filepath, buf = self._write_q.get()
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(buf.tobytes())
+            except OSError as e:
+                logging.error(f"Error writing image {filepath}: {e}")
+            finally:
+                self._write_q.task_done()
+    
+    def compute_phash(self, frame: np.ndarray, detection: Dict) -> Optional[int]:
+        """Compute a 64-bit difference hash (dHash) of the detected car's appearance"""
+        bbox = detection['bbox']
+        car_roi = frame[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+        
+        if car_roi.size == 0:
+            return None
+        
+        # 9x8 grayscale thumbnail; each bit says whether a pixel is brighter than its left neighbour
+        car_roi_gray = cv2.cvtColor(car_roi, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(car_roi_gray, (9, 8), interpolation=cv2.INTER_AREA)
+        diff = small[:, 1:] > small[:, :-1]
+        return int.from_bytes(np.packbits(diff.ravel()).tobytes(), 'big')
+    
+    @staticmethod
+    def phash_to_identifier(phash: int) -> str:
+        """Format a perceptual hash as a car identifier"""
+        return f"car_{phash:016x}"
+    
     def generate_car_identifier(self, frame: np.ndarray, detection: Dict) -> str:
         """Generate a unique identifier for a car based on its appearance"""
-        # For now, use a simple hash of the detection area
+        # For now, use a perceptual hash of the detection area
         # In a more advanced implementation, you could use:
         # - Face recognition for drivers
         # - License plate recognition
         # - Car color and model classification
-        
-        bbox = detection['bbox']
-        car_roi = frame[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-        
-        if car_roi.size == 0:
+        phash = self.compute_phash(frame, detection)
+        if phash is None:
             return f"car_{uuid.uuid4().hex[:8]}"
-        
-        # Convert RGBA to RGB if needed
-        if car_roi.shape[2] == 4:  # RGBA
-            car_roi = car_roi[:, :, :3]  # Drop alpha channel
-        
-        # Create a simple hash based on the car's appearance
-        # Resize to consistent size for hashing
-        car_roi_resized = cv2.resize(car_roi, (64, 64))
-        car_roi_gray = cv2.cvtColor(car_roi_resized, cv2.COLOR_BGR2GRAY)
-        
-        # Simple hash based on average pixel values in different regions
-        h, w = car_roi_gray.shape
-        regions = [
-            car_roi_gray[0:h//2, 0:w//2].mean(),  # Top-left
-            car_roi_gray[0:h//2, w//2:w].mean(),  # Top-right
-            car_roi_gray[h//2:h, 0:w//2].mean(),  # Bottom-left
-            car_roi_gray[h//2:h, w//2:w].mean(),  # Bottom-right
-        ]
-        
-        # Create hash from region averages
-        hash_value = sum(int(region) * (i + 1) for i, region in enumerate(regions))
-        return f"car_{hash_value % 1000000:06d}"
+        return self.phash_to_identifier(phash)
     
     def draw_detections_on_frame(self, frame: np.ndarray, detections: List[Dict], 
-                               spot_coords: Tuple[int, int, int, int] = None) -> np.ndarray:
+                               spot_coords: Tuple[int, int, int, int] = None,
+                               inplace: bool = False) -> np.ndarray:
         """Draw square boxes and labels on the frame, and draw patrol region if set"""
-        # Convert RGBA to RGB if needed for drawing
-        if frame.shape[2] == 4:  # RGBA
-            frame_copy = frame[:, :, :3].copy()  # Drop alpha channel
+        if inplace:
+            # Caller no longer needs the original frame, so draw on it directly
+            frame_copy = frame
         else:
             frame_copy = frame.copy()
         # Draw patrol region if set
-        patrol_region = getattr(Config, 'PATROL_REGION', None)
-        if patrol_region:
-            if self._is_quadrilateral_region(patrol_region):
-                # Draw quadrilateral region
-                self._draw_quadrilateral(frame_copy, patrol_region, (255, 0, 0), 2)
-            elif self._is_rectangle_region(patrol_region):
-                # Draw rectangle region (backward compatibility)
-                x, y, w, h = patrol_region
-                cv2.rectangle(frame_copy, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        if self._patrol_kind == 'quad':
+            # Draw quadrilateral region
+            self._draw_quadrilateral(frame_copy, self._patrol_region, (255, 0, 0), 2)
+        elif self._patrol_kind == 'rect':
+            # Draw rectangle region (backward compatibility)
+            x, y, w, h = self._patrol_region
+            cv2.rectangle(frame_copy, (x, y), (x + w, y + h), (255, 0, 0), 2)
         # Draw spot boundary if provided
         if spot_coords:
             x, y, w, h = spot_coords
@@ -268,26 +632,95 @@ class CarDetector:
     
     def cleanup_old_images(self):
         """Remove old images to prevent disk space issues"""
-        if not os.path.exists(Config.IMAGE_STORAGE_PATH):
+        self._saved_since_cleanup = 0
+        self._last_cleanup_ts = time.monotonic()
+        
+        # Filenames are spot_YYYYMMDD_HHMMSS_*.jpg, so name order is time order and
+        # no per-file stat is needed
+        try:
+            with os.scandir(Config.IMAGE_STORAGE_PATH) as entries:
+                files = [entry.name for entry in entries if entry.name.startswith('spot_')]
+        except FileNotFoundError:
             return
-        
-        files = os.listdir(Config.IMAGE_STORAGE_PATH)
         if len(files) <= Config.MAX_STORED_IMAGES:
             return
         
-        # Sort files by modification time (oldest first)
-        files_with_time = []
-        for file in files:
-            filepath = os.path.join(Config.IMAGE_STORAGE_PATH, file)
-            mtime = os.path.getmtime(filepath)
-            files_with_time.append((filepath, mtime))
-        
-        files_with_time.sort(key=lambda x: x[1])
-        
-        # Remove oldest files
-        files_to_remove = len(files) - Config.MAX_STORED_IMAGES
-        for i in range(files_to_remove):
+        # Remove oldest files; only the few past the limit need ordering, not the whole list
+        for file in heapq.nsmallest(len(files) - Config.MAX_STORED_IMAGES, files):
             try:
-                os.remove(files_with_time[i][0])
+                os.remove(os.path.join(Config.IMAGE_STORAGE_PATH, file))
             except OSError:
-                pass 
\ No newline at end of file
+                pass
+
+
+class MotionGate:
+    """Cheap frame-differencing gate that flags parking spots whose pixels changed"""
+    
+    def __init__(self, threshold: float = None, scale: int = None, alpha: float = 0.05):
+        self.threshold = threshold if threshold is not None else Config.MOTION_THRESHOLD
+        self.scale = max(1, scale or Config.MOTION_GATE_SCALE)
+        self.alpha = alpha
+        self._bg = None  # Running-average background (float32, decimated grayscale)
+        self.use_umat = Config.USE_OPENCL and cv2.ocl.haveOpenCL()
+        
+        # Optional Numba kernel scoring every spot in one parallel pass, with the
+        # spots' decimated slices and the output array built once
+        self._roi_mads = None
+        if Config.USE_NUMBA:
+            from .kernels import roi_mads
+            self._roi_mads = roi_mads
+        self._slices_key = None
+        self._slices = None
+        self._mads = None
+    
+    def _to_small_gray(self, frame: np.ndarray) -> np.ndarray:
+        """Decimate and convert a frame to grayscale"""
+        h, w = frame.shape[:2]
+        # With OpenCL, cvtColor/resize run on the GPU and only the small result is read back
+        gray = cv2.UMat(frame) if self.use_umat else frame
+        if frame.ndim == 3:
+            # Convert first so the area-averaging resize works on one channel, not three
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (w // self.scale, h // self.scale), interpolation=cv2.INTER_AREA)
+        return small.get() if self.use_umat else small
+    
+    def changed_spots(self, frame: np.ndarray, spot_coords_list: List[Tuple[int, int, int, int]]) -> List[bool]:
+        """Return, per spot, whether it differs from the background enough to need detection"""
+        gray = self._to_small_gray(frame)
+        
+        if self._bg is None or self._bg.shape != gray.shape:
+            # No background yet - everything needs a first look
+            self._bg = gray.astype(np.float32)
+            return [True] * len(spot_coords_list)
+        
+        if self._roi_mads is not None:
+            self._roi_mads(gray, self._bg, self._spot_slices(spot_coords_list, gray.shape), self._mads)
+            changed = (self._mads > self.threshold).tolist()
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._bg))
+            s = self.scale
+            changed = []
+            for x, y, w, h in spot_coords_list:
+                roi = diff[y // s:(y + h) // s, x // s:(x + w) // s]
+                changed.append(roi.size > 0 and float(roi.mean()) > self.threshold)
+        
+        # Slowly absorb parked cars and lighting drift into the background
+        cv2.accumulateWeighted(gray, self._bg, self.alpha)
+        return changed
+    
+    def _spot_slices(self, spot_coords_list: List[Tuple[int, int, int, int]], shape: Tuple[int, int]) -> np.ndarray:
+        """Decimated (y0, y1, x0, x1) slices clipped to the frame, rebuilt only when the spots change"""
+        key = (tuple(spot_coords_list), shape)
+        if key != self._slices_key:
+            s = self.scale
+            slices = np.array([(y // s, (y + h) // s, x // s, (x + w) // s) for x, y, w, h in spot_coords_list],
+                              dtype=np.int32).reshape(-1, 4)
+            np.clip(slices[:, :2], 0, shape[0], out=slices[:, :2])
+            np.clip(slices[:, 2:], 0, shape[1], out=slices[:, 2:])
+            # Empty after clipping -> zero-area slice, scored 0
+            slices[:, 1] = np.maximum(slices[:, 0], slices[:, 1])
+            slices[:, 3] = np.maximum(slices[:, 2], slices[:, 3])
+            self._slices = slices
+            self._mads = np.empty(len(slices), dtype=np.float32)
+            self._slices_key = key
+        return self._slices
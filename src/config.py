@@ -26,6 +26,40 @@ class Config:
     DETECTION_INTERVAL = float(os.getenv('DETECTION_INTERVAL', 5.0))  # seconds
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.1))
     CAR_DETECTION_MODEL = os.getenv('CAR_DETECTION_MODEL', 'yolov8n.pt')
+    # TensorRT FP16 engine exported from CAR_DETECTION_MODEL (GPU/Jetson only)
+    USE_TENSORRT = os.getenv('USE_TENSORRT', 'False').lower() == 'true'
+    CAR_DETECTION_MODEL_ENGINE = os.getenv('CAR_DETECTION_MODEL_ENGINE', 'yolov8n.engine')
+    # Run the engine with TRTDetector (pinned buffers, persistent context) instead of Ultralytics
+    USE_NATIVE_TENSORRT = os.getenv('USE_NATIVE_TENSORRT', 'False').lower() == 'true'
+    # CPU inference backend: pytorch, or a model exported with src.model_export
+    # (ncnn, openvino, onnxruntime or tflite) for NEON-friendly int8/fp16 inference on the Pi
+    DETECTOR_BACKEND = os.getenv('DETECTOR_BACKEND', 'pytorch').lower()
+    DETECTION_IMAGE_SIZE = int(os.getenv('DETECTION_IMAGE_SIZE', 640))  # must match the export size
+    # Resize/letterbox spot ROIs with OpenCV CUDA (needs an OpenCV build with CUDA)
+    USE_CUDA_PREPROCESS = os.getenv('USE_CUDA_PREPROCESS', 'False').lower() == 'true'
+    
+    # Spot occupancy - one detector pass on the whole frame with detections assigned to
+    # spots by IoU, or (DETECT_PER_SPOT) a batch of cropped spot images
+    DETECT_PER_SPOT = os.getenv('DETECT_PER_SPOT', 'False').lower() == 'true'
+    SPOT_IOU_THRESHOLD = float(os.getenv('SPOT_IOU_THRESHOLD', 0.3))
+    
+    # OpenCV worker threads for resize/cvtColor/imencode (0 = min(4, CPU count))
+    OPENCV_THREADS = int(os.getenv('OPENCV_THREADS', 0))
+    
+    # Run motion-gate and preview image ops through OpenCV's OpenCL T-API (UMat) when a
+    # device is available
+    USE_OPENCL = os.getenv('USE_OPENCL', 'False').lower() == 'true'
+    
+    # Motion gate - only run the detector on spots whose pixels changed
+    MOTION_GATE_ENABLED = os.getenv('MOTION_GATE_ENABLED', 'True').lower() == 'true'
+    MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 8.0))  # mean grayscale difference
+    MOTION_GATE_SCALE = int(os.getenv('MOTION_GATE_SCALE', 4))  # downscale factor
+    MOTION_GATE_MAX_SKIP_SECONDS = float(os.getenv('MOTION_GATE_MAX_SKIP_SECONDS', 300))  # force a re-check
+    # Score all spots in one Numba-compiled parallel pass (requires numba)
+    USE_NUMBA = os.getenv('USE_NUMBA', 'False').lower() == 'true'
+    # Skip detection on free spots that match their learned empty look (coarse; off by default)
+    EMPTY_BASELINE_ENABLED = os.getenv('EMPTY_BASELINE_ENABLED', 'False').lower() == 'true'
+    EMPTY_BASELINE_TOLERANCE = float(os.getenv('EMPTY_BASELINE_TOLERANCE', 0.1))  # relative variance change
     
     # Database settings
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'parking_data.db')
@@ -34,6 +68,15 @@ class Config:
     WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
     WEB_PORT = int(os.getenv('WEB_PORT', 5000))
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+    PREVIEW_MAX_WIDTH = int(os.getenv('PREVIEW_MAX_WIDTH', 640))  # live view is downscaled to this width
+    STREAM_JPEG_QUALITY = int(os.getenv('STREAM_JPEG_QUALITY', 70))  # live view only; stills keep 85
+    STATUS_BROADCAST_INTERVAL = float(os.getenv('STATUS_BROADCAST_INTERVAL', 1.0))  # seconds between pushes
+    # Serialise API responses with orjson (requires orjson)
+    USE_ORJSON = os.getenv('USE_ORJSON', 'False').lower() == 'true'
+    # Encode live view frames with simplejpeg (libjpeg-turbo, fast DCT) instead of OpenCV
+    USE_SIMPLEJPEG = os.getenv('USE_SIMPLEJPEG', 'False').lower() == 'true'
+    # Or with PyTurboJPEG (libjpeg-turbo NEON/SIMD); falls back to OpenCV if libturbojpeg is missing
+    USE_TURBOJPEG = os.getenv('USE_TURBOJPEG', 'False').lower() == 'true'
     
     # Slack settings
     SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
@@ -42,13 +85,20 @@ class Config:
     
     # Car tracking settings
     CAR_TRACKING_ENABLED = os.getenv('CAR_TRACKING_ENABLED', 'True').lower() == 'true'
+    CAR_MATCH_MAX_DISTANCE = int(os.getenv('CAR_MATCH_MAX_DISTANCE', 10))  # dHash bits
     FACE_RECOGNITION_ENABLED = os.getenv('FACE_RECOGNITION_ENABLED', 'False').lower() == 'true'
     LICENSE_PLATE_RECOGNITION_ENABLED = os.getenv('LICENSE_PLATE_RECOGNITION_ENABLED', 'False').lower() == 'true'
     
     # Image storage
     IMAGE_STORAGE_PATH = os.getenv('IMAGE_STORAGE_PATH', 'captured_images')
     MAX_STORED_IMAGES = int(os.getenv('MAX_STORED_IMAGES', 1000)) 
+    # Clean full frames kept for INT8 calibration (0 disables)
+    CALIBRATION_FRAME_INTERVAL = float(os.getenv('CALIBRATION_FRAME_INTERVAL', 1800))  # seconds
+    MAX_CALIBRATION_FRAMES = int(os.getenv('MAX_CALIBRATION_FRAMES', 200))
     
     # Patrol region as quadrilateral points (x, y) - set to None to use full frame
     # Points in order: top-left, top-right, bottom-right, bottom-left
-    PATROL_REGION = [(590, 440), (1190, 410), (1330, 460), (700, 530)]  # Askew quadrilateral 
\ No newline at end of file
+    PATROL_REGION = [(590, 440), (1190, 410), (1330, 460), (700, 530)]  # Askew quadrilateral
+    # Black out pixels outside a quadrilateral patrol region before detection; off by
+    # default since detections are already filtered to the polygon afterwards
+    MASK_PATROL_POLYGON = os.getenv('MASK_PATROL_POLYGON', 'False').lower() == 'true' 
\ No newline at end of file
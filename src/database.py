@@ -1,20 +1,72 @@
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 import json
 from .config import Config
 
 class ParkingDatabase:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, shared: bool = False):
         self.db_path = db_path or Config.DATABASE_PATH
+        # One connection per thread, reused across calls. A shared database instead
+        # keeps a single connection for callers on short-lived threads (web requests),
+        # which must serialize their calls themselves
+        self._local = threading.local()
+        self._shared = shared
+        self._shared_conn = None
         self.init_database()
     
+    def _conn(self) -> sqlite3.Connection:
+        """Get this thread's (or the shared) connection, opening it on first use"""
+        if self._shared:
+            if self._shared_conn is None:
+                self._shared_conn = self._connect()
+            return self._shared_conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a connection"""
+        # Autocommit mode - multi-statement writes use _transaction()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        # WAL lets the web interface read while the monitor thread writes,
+        # and NORMAL sync avoids an fsync per commit on the SD card
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        """Run several statements in one explicit transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn.cursor()
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def close(self):
+        """Close this thread's (or the shared) connection"""
+        if self._shared:
+            if self._shared_conn is not None:
+                self._shared_conn.close()
+                self._shared_conn = None
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
+        with self._transaction() as cursor:
             # Create parking sessions table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS parking_sessions (
@@ -41,10 +93,16 @@ class ParkingDatabase:
                     total_duration_hours REAL DEFAULT 0.0,
                     face_encoding TEXT,
                     license_plate TEXT,
+                    phash TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
+            # Add perceptual hash column to databases created before it existed
+            cursor.execute('PRAGMA table_info(car_identifiers)')
+            if 'phash' not in [column[1] for column in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE car_identifiers ADD COLUMN phash TEXT')
+            
             # Create parking spots table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS parking_spots (
@@ -73,201 +131,255 @@ class ParkingDatabase:
                 )
             ''')
             
-            # Insert default parking spots
-            for spot in Config.PARKING_SPOTS:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO parking_spots 
-                    (id, name, coords_x, coords_y, coords_width, coords_height)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    spot['id'], 
-                    spot['name'], 
-                    spot['coords'][0], 
-                    spot['coords'][1], 
-                    spot['coords'][2], 
-                    spot['coords'][3]
-                ))
+            # Indexes for the hot session lookups; the partial index keeps
+            # active-session queries small regardless of total history
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ps_active_spot
+                ON parking_sessions(spot_id) WHERE end_time IS NULL
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ps_car_start
+                ON parking_sessions(car_identifier, start_time DESC)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ps_start_time
+                ON parking_sessions(start_time)
+            ''')
+            # Sessions that ended recently, for the occupancy window in get_hourly_occupancy
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ps_end_time
+                ON parking_sessions(end_time)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_alerts_session
+                ON alerts(session_id, alert_type)
+            ''')
             
-            conn.commit()
+            # Insert default parking spots
+            cursor.executemany('''
+                INSERT OR IGNORE INTO parking_spots 
+                (id, name, coords_x, coords_y, coords_width, coords_height)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(spot['id'], spot['name'], *spot['coords']) for spot in Config.PARKING_SPOTS])
     
     def start_parking_session(self, spot_id: int, car_identifier: str = None, 
-                            confidence_score: float = 0.0, image_path: str = None) -> int:
+                            confidence_score: float = 0.0, image_path: str = None,
+                            phash: int = None) -> int:
         """Start a new parking session"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO parking_sessions 
-                (spot_id, car_identifier, start_time, confidence_score, image_path)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (spot_id, car_identifier, datetime.now(), confidence_score, image_path))
-            
-            session_id = cursor.lastrowid
-            
-            # Update car identifier stats
-            if car_identifier:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO car_identifiers 
-                    (identifier, last_seen, total_sessions)
-                    VALUES (
-                        ?, 
-                        CURRENT_TIMESTAMP,
-                        COALESCE((SELECT total_sessions FROM car_identifiers WHERE identifier = ?), 0) + 1
-                    )
-                ''', (car_identifier, car_identifier))
-            
-            conn.commit()
-            return session_id
+        with self._transaction() as cursor:
+            return self._insert_session(cursor, spot_id, car_identifier, confidence_score, image_path, phash)
     
     def end_parking_session(self, session_id: int) -> bool:
         """End a parking session and calculate duration"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get session start time
-            cursor.execute('SELECT start_time FROM parking_sessions WHERE id = ?', (session_id,))
-            result = cursor.fetchone()
-            
-            if not result:
-                return False
-            
-            start_time = datetime.fromisoformat(result[0])
-            end_time = datetime.now()
-            duration_minutes = (end_time - start_time).total_seconds() / 60
-            
+        return self._end_sessions(self._conn().cursor(), [session_id]) > 0
+    
+    def apply_session_changes(self, starts: List[Tuple], ends: List[int]) -> List[int]:
+        """Start and end several sessions in one transaction, returning the new session IDs
+        
+        starts holds (spot_id, car_identifier, confidence_score, image_path, phash) tuples.
+        """
+        with self._transaction() as cursor:
+            session_ids = [self._insert_session(cursor, *start) for start in starts]
+            if ends:
+                self._end_sessions(cursor, ends)
+        return session_ids
+    
+    def _insert_session(self, cursor: sqlite3.Cursor, spot_id: int, car_identifier: Optional[str],
+                        confidence_score: float, image_path: Optional[str], phash: Optional[int]) -> int:
+        """Insert a session and update its car's stats, returning the session ID"""
+        cursor.execute('''
+            INSERT INTO parking_sessions 
+            (spot_id, car_identifier, start_time, confidence_score, image_path)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (spot_id, car_identifier, datetime.now(), confidence_score, image_path))
+        
+        session_id = cursor.lastrowid
+        
+        # Update car identifier stats, keeping first_seen and the other columns
+        # of an existing row (REPLACE would delete and rewrite it)
+        if car_identifier:
             cursor.execute('''
-                UPDATE parking_sessions 
-                SET end_time = ?, duration_minutes = ?
-                WHERE id = ?
-            ''', (end_time, duration_minutes, session_id))
-            
-            conn.commit()
-            return True
+                INSERT INTO car_identifiers (identifier, last_seen, total_sessions, phash)
+                VALUES (?, CURRENT_TIMESTAMP, 1, ?)
+                ON CONFLICT(identifier) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    total_sessions = car_identifiers.total_sessions + 1,
+                    phash = COALESCE(excluded.phash, car_identifiers.phash)
+            ''', (car_identifier, f"{phash:016x}" if phash is not None else None))
+        
+        return session_id
+    
+    def _end_sessions(self, cursor: sqlite3.Cursor, session_ids: List[int]) -> int:
+        """Set end time and duration on sessions, returning how many were updated"""
+        # start_time is stored as local time, so the end time is bound from Python
+        # rather than using julianday('now'), which is UTC
+        end_time = datetime.now()
+        cursor.executemany('''
+            UPDATE parking_sessions 
+            SET end_time = ?,
+                duration_minutes = (julianday(?) - julianday(start_time)) * 1440
+            WHERE id = ?
+        ''', [(end_time, end_time, session_id) for session_id in session_ids])
+        return cursor.rowcount
     
     def get_active_sessions(self) -> List[Dict]:
         """Get all currently active parking sessions"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ps.id, ps.spot_id, ps.car_identifier, ps.start_time, 
-                       ps.confidence_score, ps.image_path, p.name as spot_name
-                FROM parking_sessions ps
-                JOIN parking_spots p ON ps.spot_id = p.id
-                WHERE ps.end_time IS NULL
-                ORDER BY ps.start_time
-            ''')
-            
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            SELECT ps.id, ps.spot_id, ps.car_identifier, ps.start_time, 
+                   ps.confidence_score, ps.image_path, p.name as spot_name
+            FROM parking_sessions ps
+            JOIN parking_spots p ON ps.spot_id = p.id
+            WHERE ps.end_time IS NULL
+            ORDER BY ps.start_time
+        ''')
+        
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
     def get_session_by_spot(self, spot_id: int) -> Optional[Dict]:
         """Get the active session for a specific spot"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ps.id, ps.spot_id, ps.car_identifier, ps.start_time, 
-                       ps.confidence_score, ps.image_path, p.name as spot_name
-                FROM parking_sessions ps
-                JOIN parking_spots p ON ps.spot_id = p.id
-                WHERE ps.spot_id = ? AND ps.end_time IS NULL
-            ''', (spot_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                columns = [description[0] for description in cursor.description]
-                return dict(zip(columns, result))
-            return None
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            SELECT ps.id, ps.spot_id, ps.car_identifier, ps.start_time, 
+                   ps.confidence_score, ps.image_path, p.name as spot_name
+            FROM parking_sessions ps
+            JOIN parking_spots p ON ps.spot_id = p.id
+            WHERE ps.spot_id = ? AND ps.end_time IS NULL
+        ''', (spot_id,))
+        
+        result = cursor.fetchone()
+        if result:
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, result))
+        return None
     
     def get_car_history(self, car_identifier: str) -> List[Dict]:
         """Get parking history for a specific car"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ps.id, ps.spot_id, ps.start_time, ps.end_time, 
-                       ps.duration_minutes, p.name as spot_name
-                FROM parking_sessions ps
-                JOIN parking_spots p ON ps.spot_id = p.id
-                WHERE ps.car_identifier = ?
-                ORDER BY ps.start_time DESC
-            ''', (car_identifier,))
-            
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            SELECT ps.id, ps.spot_id, ps.start_time, ps.end_time, 
+                   ps.duration_minutes, p.name as spot_name
+            FROM parking_sessions ps
+            JOIN parking_spots p ON ps.spot_id = p.id
+            WHERE ps.car_identifier = ?
+            ORDER BY ps.start_time DESC
+        ''', (car_identifier,))
+        
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
-    def get_long_parking_sessions(self, hours_threshold: int = 5) -> List[Dict]:
-        """Get sessions that have been active for more than the threshold"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ps.id, ps.spot_id, ps.car_identifier, ps.start_time, 
-                       ps.confidence_score, ps.image_path, p.name as spot_name,
-                       (julianday('now') - julianday(ps.start_time)) * 24 as hours_parked
-                FROM parking_sessions ps
-                JOIN parking_spots p ON ps.spot_id = p.id
-                WHERE ps.end_time IS NULL 
-                AND (julianday('now') - julianday(ps.start_time)) * 24 > ?
-                ORDER BY ps.start_time
-            ''', (hours_threshold,))
-            
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    def find_similar_car(self, phash: int, max_distance: int = 10) -> Optional[str]:
+        """Find the known car whose perceptual hash is closest to phash within max_distance bits"""
+        cursor = self._conn().cursor()
+        cursor.execute('SELECT identifier, phash FROM car_identifiers WHERE phash IS NOT NULL')
+        
+        best_identifier = None
+        best_distance = max_distance + 1
+        for identifier, stored_phash in cursor.fetchall():
+            distance = (phash ^ int(stored_phash, 16)).bit_count()
+            if distance < best_distance:
+                best_identifier, best_distance = identifier, distance
+        return best_identifier
     
     def create_alert(self, session_id: int, alert_type: str, message: str, 
-                    image_path: str = None) -> int:
-        """Create a new alert"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO alerts (session_id, alert_type, message, image_path)
-                VALUES (?, ?, ?, ?)
-            ''', (session_id, alert_type, message, image_path))
-            
-            alert_id = cursor.lastrowid
-            conn.commit()
-            return alert_id
+                    image_path: str = None, sent_to_slack: bool = False) -> int:
+        """Create a new alert, optionally already marked as sent to Slack"""
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            INSERT INTO alerts (session_id, alert_type, message, image_path, sent_to_slack)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, alert_type, message, image_path, sent_to_slack))
+        return cursor.lastrowid
+    
+    def get_sent_alert_session_ids(self) -> List[int]:
+        """Get IDs of active sessions that already have a long-parking alert sent"""
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            SELECT DISTINCT a.session_id
+            FROM alerts a
+            JOIN parking_sessions ps ON a.session_id = ps.id
+            WHERE a.alert_type = 'long_parking' AND a.sent_to_slack = 1
+            AND ps.end_time IS NULL
+        ''')
+        return [row[0] for row in cursor.fetchall()]
     
     def mark_alert_sent(self, alert_id: int):
         """Mark an alert as sent to Slack"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE alerts SET sent_to_slack = 1 WHERE id = ?
-            ''', (alert_id,))
-            conn.commit()
+        self._conn().execute('''
+            UPDATE alerts SET sent_to_slack = 1 WHERE id = ?
+        ''', (alert_id,))
     
     def get_parking_stats(self, days: int = 7) -> Dict:
         """Get parking statistics for the last N days"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Total sessions
-            cursor.execute('''
-                SELECT COUNT(*) FROM parking_sessions 
-                WHERE start_time >= datetime('now', '-{} days')
-            '''.format(days))
-            total_sessions = cursor.fetchone()[0]
-            
-            # Average duration
-            cursor.execute('''
-                SELECT AVG(duration_minutes) FROM parking_sessions 
-                WHERE end_time IS NOT NULL 
-                AND start_time >= datetime('now', '-{} days')
-            '''.format(days))
-            avg_duration = cursor.fetchone()[0] or 0
-            
-            # Currently occupied spots
-            cursor.execute('''
-                SELECT COUNT(*) FROM parking_sessions WHERE end_time IS NULL
-            ''')
-            occupied_spots = cursor.fetchone()[0]
-            
-            # Total spots
-            cursor.execute('SELECT COUNT(*) FROM parking_spots WHERE is_active = 1')
-            total_spots = cursor.fetchone()[0]
-            
-            return {
-                'total_sessions': total_sessions,
-                'avg_duration_minutes': round(avg_duration, 2),
-                'occupied_spots': occupied_spots,
-                'total_spots': total_spots,
-                'occupancy_rate': round((occupied_spots / total_spots) * 100, 2) if total_spots > 0 else 0
-            } 
\ No newline at end of file
+        cursor = self._conn().cursor()
+        
+        # Total sessions
+        cursor.execute('''
+            SELECT COUNT(*) FROM parking_sessions 
+            WHERE start_time >= datetime('now', '-{} days')
+        '''.format(days))
+        total_sessions = cursor.fetchone()[0]
+        
+        # Average duration
+        cursor.execute('''
+            SELECT AVG(duration_minutes) FROM parking_sessions 
+            WHERE end_time IS NOT NULL 
+            AND start_time >= datetime('now', '-{} days')
+        '''.format(days))
+        avg_duration = cursor.fetchone()[0] or 0
+        
+        # Currently occupied spots
+        cursor.execute('''
+            SELECT COUNT(*) FROM parking_sessions WHERE end_time IS NULL
+        ''')
+        occupied_spots = cursor.fetchone()[0]
+        
+        # Total spots
+        cursor.execute('SELECT COUNT(*) FROM parking_spots WHERE is_active = 1')
+        total_spots = cursor.fetchone()[0]
+        
+        return {
+            'total_sessions': total_sessions,
+            'avg_duration_minutes': round(avg_duration, 2),
+            'occupied_spots': occupied_spots,
+            'total_spots': total_spots,
+            'occupancy_rate': round((occupied_spots / total_spots) * 100, 2) if total_spots > 0 else 0
+        }
+    
+    def get_hourly_occupancy(self, hours: int = 24) -> List[Tuple[datetime, float]]:
+        """Get the occupancy rate at each of the last N hourly points, oldest first"""
+        cursor = self._conn().cursor()
+        cursor.execute('SELECT COUNT(*) FROM parking_spots WHERE is_active = 1')
+        total_spots = cursor.fetchone()[0]
+        
+        # Count the spots occupied at each point, stepping back an hour at a time from
+        # now (local time, like start_time). Sessions overlapping the window are picked
+        # once through the active and end_time indexes, so the cost follows the window
+        # rather than the whole (never pruned) history
+        now = datetime.now()
+        earliest = now - timedelta(hours=max(hours - 1, 0))
+        cursor.execute('''
+            WITH RECURSIVE points(n, t) AS (
+                SELECT 0, ?
+                UNION ALL
+                SELECT n + 1, datetime(t, '-1 hour') FROM points WHERE n + 1 < ?
+            ),
+            recent AS MATERIALIZED (
+                SELECT spot_id, start_time, end_time
+                FROM parking_sessions
+                WHERE end_time IS NULL OR end_time > ?
+            )
+            SELECT points.t, COUNT(DISTINCT ps.spot_id)
+            FROM points
+            LEFT JOIN recent ps ON ps.start_time <= points.t
+                AND (ps.end_time IS NULL OR ps.end_time > points.t)
+            GROUP BY points.n
+            ORDER BY points.n DESC
+        ''', (now.strftime('%Y-%m-%d %H:%M:%S'), hours, earliest.strftime('%Y-%m-%d %H:%M:%S')))
+        
+        return [
+            (datetime.fromisoformat(time_point),
+             round((occupied / total_spots) * 100, 2) if total_spots > 0 else 0)
+            for time_point, occupied in cursor.fetchall()
+        ] 
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""Numba-compiled numeric kernels (optional - enable with USE_NUMBA=True)"""
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def roi_mads(frame, background, slices, out):
+    """Mean absolute difference between a grayscale frame and its background inside each
+    (y0, y1, x0, x1) slice, written to out; slices must lie within the frame"""
+    for i in prange(slices.shape[0]):
+        y0, y1, x0, x1 = slices[i, 0], slices[i, 1], slices[i, 2], slices[i, 3]
+        total = 0.0
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                total += abs(np.float32(frame[y, x]) - background[y, x])
+        n = (y1 - y0) * (x1 - x0)
+        out[i] = total / n if n > 0 else 0.0
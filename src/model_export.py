@@ -0,0 +1,109 @@
+"""
+Export the YOLO detector to optimized TensorRT engines or CPU inference formats
+
+Usage:
+    python -m src.model_export                                      # FP16 TensorRT engine
+    python -m src.model_export --int8                               # INT8 engine calibrated on captured frames
+    python -m src.model_export --format ncnn --imgsz 416            # NCNN model for the Pi CPU
+    python -m src.model_export --format openvino --int8 --imgsz 416 # INT8 OpenVINO model
+    python -m src.model_export --format tflite --int8 --imgsz 416   # INT8 TFLite model (XNNPACK on ARM)
+"""
+
+import argparse
+import os
+import shutil
+from .config import Config
+
+# COCO class IDs used by CarDetector (car=2, bus=5, truck=7)
+CALIBRATION_CLASS_NAMES = {2: 'car', 5: 'bus', 7: 'truck'}
+
+def build_calibration_dataset(output_dir: str = 'calibration', max_images: int = 200) -> str:
+    """Collect representative parking-lot frames into a dataset yaml for INT8 calibration"""
+    # Only the clean full frames saved by CarDetector.save_calibration_frame; the spot_*
+    # crops carry drawn boxes and text that would skew the activation ranges
+    images = []
+    if os.path.isdir(Config.IMAGE_STORAGE_PATH):
+        images = sorted(f for f in os.listdir(Config.IMAGE_STORAGE_PATH)
+                        if f.startswith('calib_') and f.endswith('.jpg'))
+    if not images:
+        raise FileNotFoundError(f"No calibration frames found in {Config.IMAGE_STORAGE_PATH}; "
+                                "run the monitor with CALIBRATION_FRAME_INTERVAL > 0 first")
+
+    # Sample evenly across the capture history so calibration covers different times of day
+    step = max(1, len(images) // max_images)
+    selected = images[::step][:max_images]
+
+    images_dir = os.path.join(output_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    for filename in selected:
+        shutil.copy(os.path.join(Config.IMAGE_STORAGE_PATH, filename), images_dir)
+
+    yaml_path = os.path.join(output_dir, 'calib.yaml')
+    with open(yaml_path, 'w') as f:
+        f.write(f"path: {os.path.abspath(output_dir)}\n")
+        f.write("train: images\n")
+        f.write("val: images\n")
+        f.write("names:\n")
+        for class_id, name in CALIBRATION_CLASS_NAMES.items():
+            f.write(f"  {class_id}: {name}\n")
+
+    return yaml_path
+
+def export_engine(int8: bool = False, imgsz: int = 640, batch: int = None) -> str:
+    """Export Config.CAR_DETECTION_MODEL to a TensorRT engine and return its path"""
+    from ultralytics import YOLO
+
+    # Dynamic batch sized for one ROI per parking spot (see detect_cars_in_spots_batched)
+    batch = batch or max(1, len(Config.PARKING_SPOTS))
+    model = YOLO(Config.CAR_DETECTION_MODEL)
+    export_args = {'format': 'engine', 'imgsz': imgsz, 'device': 0, 'workspace': 2,
+                   'dynamic': True, 'batch': batch}
+    if int8:
+        export_args.update(int8=True, data=build_calibration_dataset())
+    else:
+        export_args['half'] = True
+
+    return model.export(**export_args)
+
+def export_cpu_model(fmt: str, int8: bool = False, imgsz: int = 416) -> str:
+    """Export Config.CAR_DETECTION_MODEL for CPU inference (ncnn, openvino, onnx or tflite) and return its path"""
+    from ultralytics import YOLO
+
+    model = YOLO(Config.CAR_DETECTION_MODEL)
+    export_args = {'format': fmt, 'imgsz': imgsz}
+    if fmt == 'ncnn':
+        export_args['half'] = True
+    elif fmt == 'onnx':
+        export_args['simplify'] = True
+    if int8:
+        # Ultralytics only quantizes these CPU formats; NCNN and ONNX exports stay fp16/fp32
+        if fmt not in ('openvino', 'tflite'):
+            raise ValueError("INT8 CPU export is only supported for the openvino and tflite formats")
+        export_args.update(int8=True, data=build_calibration_dataset())
+
+    return model.export(**export_args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the car detector to TensorRT or a CPU format")
+    parser.add_argument('--format', choices=['engine', 'ncnn', 'openvino', 'onnx', 'tflite'], default='engine',
+                        help="Export format (engine is TensorRT)")
+    parser.add_argument('--int8', action='store_true',
+                        help="Quantize to INT8 using calibration frames from IMAGE_STORAGE_PATH")
+    parser.add_argument('--imgsz', type=int, default=640, help="Inference image size")
+    parser.add_argument('--batch', type=int, default=None,
+                        help="Maximum batch size (defaults to the number of parking spots)")
+    args = parser.parse_args()
+
+    if args.format == 'engine':
+        engine_path = export_engine(int8=args.int8, imgsz=args.imgsz, batch=args.batch)
+        print(f"Exported engine: {engine_path}")
+        print("Set USE_TENSORRT=True and CAR_DETECTION_MODEL_ENGINE in .env to use it")
+        return
+
+    model_path = export_cpu_model(args.format, int8=args.int8, imgsz=args.imgsz)
+    backend = 'onnxruntime' if args.format == 'onnx' else args.format
+    print(f"Exported model: {model_path}")
+    print(f"Set DETECTOR_BACKEND={backend} and DETECTION_IMAGE_SIZE={args.imgsz} in .env to use it")
+
+if __name__ == '__main__':
+    main()
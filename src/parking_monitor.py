@@ -1,29 +1,110 @@
+import asyncio
 import cv2
+import numpy as np
+import os
 import time
 import threading
+import queue
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
 from .config import Config
 from .database import ParkingDatabase
-from .car_detector import CarDetector
-from .slack_integration import SlackIntegration
-from picamera2 import Picamera2
+from .car_detector import CarDetector, MotionGate
 
 
 class ParkingMonitor:
+    ALERT_CHECK_INTERVAL = 60  # seconds between long-parking alert checks
+    READ_FAILURES_BEFORE_REINIT = 5  # consecutive failed reads before restarting the camera
+    DETECTION_RING_SIZE = 3  # preallocated frames handed to the detector in turn
+    CAPTURE_POOL_SIZE = 6  # preallocated frames the capture thread reuses once released
+    
     def __init__(self):
+        # Use OpenCV's SIMD (NEON on the Pi) code paths and split its work across cores
+        cv2.setUseOptimized(True)
+        cv2.setNumThreads(Config.OPENCV_THREADS or min(4, os.cpu_count() or 1))
+        cv2.ocl.setUseOpenCL(Config.USE_OPENCL)
+        
         self.database = ParkingDatabase()
         self.car_detector = CarDetector()
-        self.slack = SlackIntegration()
+        self.motion_gate = MotionGate() if Config.MOTION_GATE_ENABLED else None
+        # slack_sdk is only imported when a bot token is configured
+        self.slack = None
+        if Config.SLACK_BOT_TOKEN:
+            from .slack_integration import SlackIntegration
+            self.slack = SlackIntegration()
+        
+        # Slack calls run on their own event loop thread so a slow HTTPS request
+        # never stalls the monitoring tick
+        self._net_loop = None
+        self._net_thread = None
+        if self.slack:
+            self._net_loop = asyncio.new_event_loop()
+            self._net_thread = threading.Thread(target=self._net_loop.run_forever, daemon=True)
+            self._net_thread.start()
         
         # Camera setup - consolidated to PiCamera2 only
         self.camera = None
         self.is_running = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()
+        
+        # Camera read failure tracking for read_frame's reinit backoff
+        self._consecutive_read_failures = 0
+        self._last_reinit = 0
+        self._reinit_backoff = 1  # seconds, doubled per reinit up to 30
+        
+        # Deadlines for rate-limited warnings (time.monotonic())
+        self._next_camera_warning = 0
+        self._next_read_warning = 0
+        
+        # Capture thread feeding two stages: the live view (two newest frames) and,
+        # on request, the detector (one frame)
+        self.capture_thread = None
+        self._frame_q = queue.Queue(maxsize=2)
+        self._capture_q = queue.Queue(maxsize=1)
+        self._frame_wanted = threading.Event()
+        # Captured frames are copied out of the camera's buffers into preallocated
+        # arrays (allocated on the first frame). Whoever takes a frame from get_frame
+        # owns it until it is handed back with release_frame; the capture thread only
+        # reuses released frames and allocates a fresh one when none is free, so a
+        # slow consumer never has its frame overwritten
+        self._free_frames = queue.Queue()
+        self._frame_layout = None  # (shape, dtype) of the pooled frames
+        # Detection frames are copied into a ring of preallocated buffers (allocated on
+        # the first frame). At most two are live - one being processed, one queued
+        self._detect_ring = None
+        self._detect_idx = 0
+        
+        # Spot lookups and coordinate arrays, built once
+        self._spots = list(Config.PARKING_SPOTS)
+        self._spot_ids = [spot['id'] for spot in self._spots]
+        self._spot_coords = [tuple(spot['coords']) for spot in self._spots]
+        self._spot_boxes = np.array(self._spot_coords, dtype=np.float32).reshape(-1, 4)  # (x, y, w, h) rows
+        self._spot_name_by_id = {spot['id']: spot['name'] for spot in self._spots}
+        # When each spot last got past the motion gate, and when the detector last ran
+        # on it (time.monotonic())
+        self._spot_checked_at = [0.0] * len(self._spots)
+        self._spot_detected_at = [0.0] * len(self._spots)
         
-        # Track active sessions
+        # Latest detections per spot from the monitor thread, drawn on the live view
+        self._spot_detections = {}  # spot_id -> detections
+        self._annot_lock = threading.Lock()
+        
+        # Track active sessions. Copy-on-write: writers replace the dict rather than
+        # mutating it, so web readers can iterate it without a lock. Writers (the
+        # monitor thread, and stop_monitoring if the monitor is slow to exit) hold
+        # _sessions_lock for the swap and the pending lists only
         self.active_sessions = {}  # spot_id -> session_data
+        self._sessions_lock = threading.RLock()
+        
+        # Sessions that already have a long-parking alert sent, or one in flight
+        self._alerted_session_ids = set()
+        self._alerts_in_flight = set()
+        
+        # Session starts/ends from the current tick, written in one transaction
+        self._pending_starts = []  # (session_data, phash)
+        self._pending_ends = []  # session IDs
         
         # Setup logger
         self.logger = logging.getLogger(__name__)
@@ -34,9 +115,15 @@ class ParkingMonitor:
     def _load_active_sessions(self):
         """Load existing active sessions from database"""
         active_sessions = self.database.get_active_sessions()
+        loaded = {}
         for session in active_sessions:
-            self.active_sessions[session['spot_id']] = session
-        self.logger.info(f"Loaded {len(active_sessions)} active sessions")
+            # Parse once here; sessions keep start_time as a datetime in memory
+            session['start_time'] = datetime.fromisoformat(session['start_time'])
+            loaded[session['spot_id']] = session
+        with self._sessions_lock:
+            self.active_sessions = {**self.active_sessions, **loaded}
+        self._alerted_session_ids = set(self.database.get_sent_alert_session_ids())
+        self.logger.info("Loaded %d active sessions", len(active_sessions))
     
     def start_camera(self):
         """Initialize and start the camera using PiCamera2"""
@@ -45,11 +132,15 @@ class ParkingMonitor:
             self._release_camera_resources()
             
             # Initialize camera
+            from picamera2 import Picamera2  # Deferred so camera-less setups skip loading libcamera
             self.camera = Picamera2()
             
-            # Configure camera with specified properties
-            config = self.camera.create_preview_configuration(
-                main={"size": (Config.CAMERA_WIDTH, Config.CAMERA_HEIGHT)},
+            # Configure camera with specified properties. RGB888 gives 3-channel BGR
+            # frames that OpenCV and YOLO use directly, and four buffers let the
+            # sensor keep streaming while a frame is being processed
+            config = self.camera.create_video_configuration(
+                main={"size": (Config.CAMERA_WIDTH, Config.CAMERA_HEIGHT), "format": "RGB888"},
+                buffer_count=4,
                 controls={"FrameDurationLimits": (int(1000000/Config.FRAME_RATE), int(1000000/Config.FRAME_RATE))}
             )
             self.camera.configure(config)
@@ -70,11 +161,11 @@ class ParkingMonitor:
                     self.stop_camera()
                     return False
             
-            self.logger.info(f"Camera initialized successfully with PiCamera2 - Frame shape: {test_frame.shape}")
+            self.logger.info("Camera initialized successfully with PiCamera2 - Frame shape: %s", test_frame.shape)
             return True
             
         except Exception as e:
-            self.logger.error(f"Failed to initialize camera: {e}")
+            self.logger.error("Failed to initialize camera: %s", e)
             if self.camera:
                 try:
                     self.camera.stop()
@@ -103,7 +194,7 @@ class ParkingMonitor:
             # If you want to add custom camera resource cleanup, do it here.
             
         except Exception as e:
-            self.logger.debug(f"Error releasing camera resources: {e}")
+            self.logger.debug("Error releasing camera resources: %s", e)
     
     def stop_camera(self):
         """Stop and release the camera"""
@@ -116,34 +207,59 @@ class ParkingMonitor:
             self.camera = None
         self.logger.info("Camera stopped")
     
+    def _capture_frame(self):
+        """Copy the main stream of a completed request into a free pooled frame and
+        return the request's buffer to the camera"""
+        from picamera2 import MappedArray
+        request = self.camera.capture_request()
+        try:
+            with MappedArray(request, "main") as mapped:
+                image = mapped.array
+                if self._frame_layout != (image.shape, image.dtype):
+                    free_frames = queue.Queue()
+                    for _ in range(self.CAPTURE_POOL_SIZE):
+                        free_frames.put(np.empty(image.shape, dtype=image.dtype))
+                    self._free_frames = free_frames
+                    self._frame_layout = (image.shape, image.dtype)
+                try:
+                    frame = self._free_frames.get_nowait()
+                except queue.Empty:
+                    # Every pooled frame is still held by a consumer
+                    frame = np.empty(image.shape, dtype=image.dtype)
+                np.copyto(frame, image)
+                return frame
+        finally:
+            request.release()
+    
+    def release_frame(self, frame):
+        """Hand a frame from get_frame back to the capture thread for reuse"""
+        # Frames from an older resolution, or beyond the pool size, are left to the GC
+        if (frame is not None and self._frame_layout == (frame.shape, frame.dtype)
+                and self._free_frames.qsize() < self.CAPTURE_POOL_SIZE):
+            self._free_frames.put(frame)
+    
     def read_frame(self):
-        """Read a frame from the camera"""
+        """Read a frame from the camera, reinitializing it with backoff after repeated failures"""
         if self.camera:
             try:
-                frame = self.camera.capture_array()
+                frame = self._capture_frame()
                 if frame is not None and frame.size > 0:
+                    self._consecutive_read_failures = 0
+                    self._reinit_backoff = 1
                     return True, frame
-                else:
-                    # Try to reinitialize camera if frame reading fails
-                    self.logger.warning("Frame read failed, attempting to reinitialize camera...")
-                    self.stop_camera()
-                    time.sleep(2)
-                    if self.start_camera():
-                        frame = self.camera.capture_array()
-                        if frame is not None and frame.size > 0:
-                            return True, frame
             except Exception as e:
-                self.logger.error(f"Error reading frame: {e}")
-                # Try to reinitialize camera
-                self.stop_camera()
-                time.sleep(2)
-                if self.start_camera():
-                    try:
-                        frame = self.camera.capture_array()
-                        if frame is not None and frame.size > 0:
-                            return True, frame
-                    except:
-                        pass
+                self.logger.error("Error reading frame: %s", e)
+        
+        # Fail fast; only reinitialize once failures persist, backing off up to 30 s
+        self._consecutive_read_failures += 1
+        now = time.monotonic()
+        if (self._consecutive_read_failures >= self.READ_FAILURES_BEFORE_REINIT
+                and now - self._last_reinit >= self._reinit_backoff):
+            self.logger.warning("Frame read failed, attempting to reinitialize camera...")
+            self._last_reinit = now
+            self._reinit_backoff = min(self._reinit_backoff * 2, 30)
+            self.stop_camera()
+            self.start_camera()
         return False, None
     
     def start_monitoring(self):
@@ -158,13 +274,18 @@ class ParkingMonitor:
             self.logger.warning("Camera not available - system will run without camera monitoring")
         
         self.is_running = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         
+        if camera_available:
+            self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self.capture_thread.start()
+        
         self.logger.info("Parking monitoring started")
         
         # Send startup notification
-        if self.slack.is_connected():
+        if self.slack and self.slack.is_connected():
             self.slack.send_system_status("System Online", "Parking monitor started successfully")
         
         return True
@@ -172,114 +293,249 @@ class ParkingMonitor:
     def stop_monitoring(self):
         """Stop the parking monitoring process"""
         self.is_running = False
+        self._stop_event.set()
         
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
         
+        if self.capture_thread:
+            self.capture_thread.join(timeout=5)
+        
         self.stop_camera()
         
         # End all active sessions
-        for spot_id in list(self.active_sessions.keys()):
-            self._end_session(spot_id)
+        while self.active_sessions:
+            self._end_session(next(iter(self.active_sessions)))
+        self._flush_session_changes()
         
         self.logger.info("Parking monitoring stopped")
         
         # Send shutdown notification
-        if self.slack.is_connected():
+        if self.slack and self.slack.is_connected():
             self.slack.send_system_status("System Offline", "Parking monitor stopped")
+        
+        if self._net_loop:
+            try:
+                asyncio.run_coroutine_threadsafe(self.slack.close_async(), self._net_loop).result(timeout=5)
+            except Exception as e:
+                self.logger.warning("Error closing Slack session: %s", e)
+            self._net_loop.call_soon_threadsafe(self._net_loop.stop)
+            self._net_thread.join(timeout=5)
+        
+        if self.slack:
+            # Let the offline notice go out before the worker threads stop
+            self.slack.shutdown()
+    
+    def _capture_loop(self):
+        """Capture frames continuously and hand them to the detector and live view"""
+        while self.is_running:
+            ret, frame = self.read_frame()
+            if not ret:
+                self._stop_event.wait(0.1)
+                continue
+            if self._frame_wanted.is_set():
+                self._frame_wanted.clear()
+                # The live view draws on its frame in place, so the detector gets a copy
+                self._put_latest(self._capture_q, self._ring_copy(frame))
+            # A frame the live view never picked up goes straight back to the pool
+            self._put_latest(self._frame_q, frame, on_drop=self.release_frame)
+    
+    def _ring_copy(self, frame: np.ndarray) -> np.ndarray:
+        """Copy a frame into the next slot of the detection ring buffer"""
+        if self._detect_ring is None or self._detect_ring.shape[1:] != frame.shape:
+            self._detect_ring = np.empty((self.DETECTION_RING_SIZE,) + frame.shape, dtype=frame.dtype)
+        slot = self._detect_ring[self._detect_idx]
+        self._detect_idx = (self._detect_idx + 1) % self.DETECTION_RING_SIZE
+        np.copyto(slot, frame)
+        return slot
+    
+    @staticmethod
+    def _put_latest(frame_q: queue.Queue, frame, on_drop=None):
+        """Queue a frame, dropping the oldest rather than blocking when the consumer falls behind"""
+        while True:
+            try:
+                frame_q.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    dropped = frame_q.get_nowait()
+                except queue.Empty:
+                    continue
+                if on_drop:
+                    on_drop(dropped)
+    
+    def get_frame(self, timeout: float = 1.0):
+        """Wait for the next captured frame, returning None on timeout. The caller owns the
+        frame until it passes it to release_frame"""
+        try:
+            return self._frame_q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def _next_detection_frame(self, timeout: float = 2.0):
+        """Ask the capture thread for a fresh frame for detection, returning None on timeout"""
+        self._frame_wanted.set()
+        try:
+            return self._capture_q.get(timeout=timeout)
+        except queue.Empty:
+            return None
     
     def _monitor_loop(self):
         """Main monitoring loop"""
-        last_detection_time = 0
+        next_detection = next_alert_check = time.monotonic()
         
-        while self.is_running:
+        while not self._stop_event.is_set():
             try:
-                current_time = time.time()
+                now = time.monotonic()
                 
                 # Check if it's time for detection
-                if current_time - last_detection_time >= Config.DETECTION_INTERVAL:
+                if now >= next_detection:
                     self._check_all_spots()
-                    last_detection_time = current_time
+                    next_detection = now + Config.DETECTION_INTERVAL
                 
                 # Check for long-parking alerts
-                self._check_long_parking_alerts()
-                
-                # Cleanup old images periodically
-                if int(current_time) % 3600 == 0:  # Every hour
-                    self.car_detector.cleanup_old_images()
+                if now >= next_alert_check:
+                    self._check_long_parking_alerts()
+                    next_alert_check = now + self.ALERT_CHECK_INTERVAL
                 
-                time.sleep(1)  # Small delay to prevent excessive CPU usage
+                # Sleep until the next task is due; stop_monitoring() wakes us immediately
+                self._stop_event.wait(max(0, min(next_detection, next_alert_check) - time.monotonic()))
                 
             except Exception as e:
-                self.logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(5)  # Wait before retrying
+                self.logger.error("Error in monitoring loop: %s", e)
+                self._stop_event.wait(5)  # Wait before retrying
     
     def _check_all_spots(self):
         """Check all parking spots for cars"""
         if not self.camera:
             # Only log this error occasionally to avoid spam
-            if int(time.time()) % 60 == 0:  # Every minute
+            if time.monotonic() >= self._next_camera_warning:
                 self.logger.warning("Camera not available - skipping spot detection")
+                self._next_camera_warning = time.monotonic() + 60
             return
         
-        ret, frame = self.read_frame()
-        if not ret:
+        frame = self._next_detection_frame()
+        if frame is None:
             # Only log this error occasionally to avoid spam
-            if int(time.time()) % 30 == 0:  # Every 30 seconds
+            if time.monotonic() >= self._next_read_warning:
                 self.logger.warning("Failed to read frame from camera - this may be normal if no camera is connected")
+                self._next_read_warning = time.monotonic() + 30
             return
+        self.car_detector.save_calibration_frame(frame)
         
-        for spot in Config.PARKING_SPOTS:
-            spot_id = spot['id']
-            spot_coords = spot['coords']
+        # Indices of the spots still to be checked this tick
+        indices = range(len(self._spots))
+        now = time.monotonic()
+        if self.motion_gate:
+            # Unchanged spots keep their current state without running the detector, but
+            # are re-checked every MOTION_GATE_MAX_SKIP_SECONDS so a car slowly absorbed
+            # into the gate's background is not missed for good
+            changed = self.motion_gate.changed_spots(frame, self._spot_coords)
+            indices = [i for i in indices
+                       if changed[i] or now - self._spot_checked_at[i] >= Config.MOTION_GATE_MAX_SKIP_SECONDS]
+            if not indices:
+                return
+            for i in indices:
+                self._spot_checked_at[i] = now
+        
+        if Config.EMPTY_BASELINE_ENABLED:
+            # Free spots that still look like their learned empty state skip the detector.
+            # The signature is coarse, so it never ends a session (occupied spots always go
+            # to the detector) and every spot still gets a detector pass at least every
+            # MOTION_GATE_MAX_SKIP_SECONDS
+            active_sessions = self.active_sessions
+            remaining = []
+            for i in indices:
+                if (self._spot_ids[i] not in active_sessions
+                        and now - self._spot_detected_at[i] < Config.MOTION_GATE_MAX_SKIP_SECONDS
+                        and self.car_detector.matches_empty_baseline(frame, self._spot_coords[i])):
+                    self._publish_detections(self._spot_ids[i], [])
+                else:
+                    remaining.append(i)
+            indices = remaining
+            if not indices:
+                return
+        for i in indices:
+            self._spot_detected_at[i] = now
+        
+        spot_coords_list = [self._spot_coords[i] for i in indices]
+        if Config.DETECT_PER_SPOT:
+            # Run the detector once on a batch of all spot crops
+            spot_detections = self.car_detector.detect_cars_in_spots_batched(frame, spot_coords_list)
+        else:
+            # One detector pass over the whole frame, with boxes assigned to spots geometrically
+            spot_detections = self.car_detector.assign_detections_to_spots(
+                self.car_detector.detect_cars_in_frame(frame), self._spot_boxes[list(indices)])
+        
+        for i, detections in zip(indices, spot_detections):
+            spot_id = self._spot_ids[i]
+            spot_coords = self._spot_coords[i]
+            self._publish_detections(spot_id, detections)
             
             # Check if spot is occupied
-            is_occupied, confidence, image_path = self.car_detector.is_spot_occupied(frame, spot_coords)
+            is_occupied, confidence, image_path = self.car_detector.spot_occupancy_from_detections(
+                frame, spot_coords, detections)
             
             if is_occupied:
-                self._handle_car_detected(spot_id, spot_coords, confidence, image_path, frame)
+                self._handle_car_detected(spot_id, spot_coords, confidence, image_path, frame, detections)
             else:
+                if Config.EMPTY_BASELINE_ENABLED:
+                    self.car_detector.update_empty_baseline(frame, spot_coords)
                 self._handle_car_left(spot_id)
+        
+        self._flush_session_changes()
+    
+    def _publish_detections(self, spot_id: int, detections: List[Dict]):
+        """Record a spot's latest detections for the live view"""
+        with self._annot_lock:
+            self._spot_detections[spot_id] = detections
+    
+    def get_latest_detections(self) -> List[Dict]:
+        """Get the most recent detections across all spots"""
+        with self._annot_lock:
+            return [detection for detections in self._spot_detections.values() for detection in detections]
     
     def _handle_car_detected(self, spot_id: int, spot_coords: tuple, confidence: float, 
-                           image_path: str, frame):
+                           image_path: str, frame, detections: Optional[List[Dict]] = None):
         """Handle when a car is detected in a parking spot"""
         # Check if there's already an active session for this spot
         if spot_id in self.active_sessions:
             # Update existing session
             session = self.active_sessions[spot_id]
-            self.logger.debug(f"Car still in spot {spot_id} (session {session['id']})")
+            self.logger.debug("Car still in spot %s (session %s)", spot_id, session['id'])
             return
         
         # Start new session
         car_identifier = None
+        phash = None
         if Config.CAR_TRACKING_ENABLED:
             # Generate car identifier
-            detections = self.car_detector.detect_cars_in_spot(frame, spot_coords)
+            if detections is None:
+                detections = self.car_detector.detect_cars_in_spot(frame, spot_coords)
             if detections:
-                car_identifier = self.car_detector.generate_car_identifier(frame, detections[0])
+                phash = self.car_detector.compute_phash(frame, detections[0])
+                if phash is not None:
+                    # Reuse the identifier of a previously seen car with a near-identical hash
+                    car_identifier = (self.database.find_similar_car(phash, Config.CAR_MATCH_MAX_DISTANCE)
+                                      or self.car_detector.phash_to_identifier(phash))
         
-        session_id = self.database.start_parking_session(
-            spot_id=spot_id,
-            car_identifier=car_identifier,
-            confidence_score=confidence,
-            image_path=image_path
-        )
-        
-        # Store session data
+        # Store session data; the ID is filled in when the tick's changes are flushed
         session_data = {
-            'id': session_id,
+            'id': None,
             'spot_id': spot_id,
             'car_identifier': car_identifier,
-            'start_time': datetime.now().isoformat(),
+            'start_time': datetime.now(),
             'confidence_score': confidence,
             'image_path': image_path,
-            'spot_name': next((s['name'] for s in Config.PARKING_SPOTS if s['id'] == spot_id), f"Spot {spot_id}")
+            'spot_name': self._spot_name_by_id.get(spot_id, f"Spot {spot_id}")
         }
+        if self.slack:
+            # Encoded once now so a later alert uploads bytes instead of re-reading the file
+            session_data['alert_jpeg'] = self.car_detector.encode_alert_image(frame, spot_coords)
         
-        self.active_sessions[spot_id] = session_data
-        
-        self.logger.info(f"New car detected in spot {spot_id} (session {session_id})")
+        with self._sessions_lock:
+            self.active_sessions = {**self.active_sessions, spot_id: session_data}
+            self._pending_starts.append((session_data, phash))
     
     def _handle_car_left(self, spot_id: int):
         """Handle when a car leaves a parking spot"""
@@ -288,46 +544,86 @@ class ParkingMonitor:
     
     def _end_session(self, spot_id: int):
         """End a parking session"""
-        session_data = self.active_sessions[spot_id]
-        session_id = session_data['id']
+        with self._sessions_lock:
+            if spot_id not in self.active_sessions:
+                return
+            active_sessions = dict(self.active_sessions)
+            session_data = active_sessions.pop(spot_id)
+            self.active_sessions = active_sessions
+            session_id = session_data['id']
+            if session_id is None:
+                # Started this tick and not yet written; drop the pending start
+                self._pending_starts = [(s, p) for s, p in self._pending_starts if s is not session_data]
+                return
+            self._pending_ends.append(session_id)
+        # The session is over, so its alert entry can go
+        self._alerted_session_ids.discard(session_id)
+        
+        duration_minutes = (datetime.now() - session_data['start_time']).total_seconds() / 60
+        self.logger.info("Car left spot %s (session %s) - Duration: %.1f minutes", spot_id, session_id, duration_minutes)
+    
+    def _flush_session_changes(self):
+        """Write the tick's session starts and ends to the database in one transaction"""
+        with self._sessions_lock:
+            if not self._pending_starts and not self._pending_ends:
+                return
+            starts, self._pending_starts = self._pending_starts, []
+            ends, self._pending_ends = self._pending_ends, []
         
-        if self.database.end_parking_session(session_id):
-            duration_minutes = session_data.get('duration_minutes', 0)
-            self.logger.info(f"Car left spot {spot_id} (session {session_id}) - Duration: {duration_minutes:.1f} minutes")
+        session_ids = self.database.apply_session_changes(
+            [(s['spot_id'], s['car_identifier'], s['confidence_score'], s['image_path'], phash)
+             for s, phash in starts],
+            ends)
         
-        del self.active_sessions[spot_id]
+        for (session_data, _), session_id in zip(starts, session_ids):
+            session_data['id'] = session_id
+            self.logger.info("New car detected in spot %s (session %s)", session_data['spot_id'], session_id)
     
     def _check_long_parking_alerts(self):
         """Check for cars that have been parked too long and send Slack alerts"""
-        long_sessions = self.database.get_long_parking_sessions(Config.SLACK_ALERT_THRESHOLD)
+        # Active sessions are all in memory, so no database query is needed
+        threshold = timedelta(hours=Config.SLACK_ALERT_THRESHOLD)
+        now = datetime.now()
         
-        for session in long_sessions:
+        for session in self.active_sessions.values():
+            if session['id'] is None or now - session['start_time'] <= threshold:
+                continue
             # Check if we've already sent an alert for this session
             if not self._has_alert_been_sent(session['id']):
                 self._send_long_parking_alert(session)
     
     def _has_alert_been_sent(self, session_id: int) -> bool:
         """Check if an alert has already been sent for this session"""
-        # This is a simplified check - in a real implementation, you'd query the alerts table
-        # For now, we'll assume no alerts have been sent
-        return False
+        return session_id in self._alerted_session_ids or session_id in self._alerts_in_flight
     
     def _send_long_parking_alert(self, session_data: Dict):
-        """Send a Slack alert for a car parked too long"""
-        if not self.slack.is_connected():
+        """Queue a Slack alert for a car parked too long on the network event loop"""
+        if not (self.slack and self.slack.is_connected()):
             return
         
+        self._alerts_in_flight.add(session_data['id'])
+        asyncio.run_coroutine_threadsafe(self._send_long_parking_alert_async(session_data), self._net_loop)
+    
+    async def _send_long_parking_alert_async(self, session_data: Dict):
+        """Send the alert and record it once Slack has accepted it"""
+        session_id = session_data['id']
         image_path = session_data.get('image_path')
-        if self.slack.send_parking_alert(session_data, image_path):
-            # Mark alert as sent in database
-            alert_id = self.database.create_alert(
-                session_id=session_data['id'],
-                alert_type='long_parking',
-                message=f"Car parked for over {Config.SLACK_ALERT_THRESHOLD} hours",
-                image_path=image_path
-            )
-            self.database.mark_alert_sent(alert_id)
-            self.logger.info(f"Sent long-parking alert for session {session_data['id']}")
+        try:
+            if await self.slack.send_parking_alert_async(session_data, image_path):
+                # Record the alert as sent in a single insert
+                self.database.create_alert(
+                    session_id=session_id,
+                    alert_type='long_parking',
+                    message=f"Car parked for over {Config.SLACK_ALERT_THRESHOLD} hours",
+                    image_path=image_path,
+                    sent_to_slack=True
+                )
+                self._alerted_session_ids.add(session_id)
+                self.logger.info("Sent long-parking alert for session %s", session_id)
+        except Exception as e:
+            self.logger.error("Error sending long-parking alert for session %s: %s", session_id, e)
+        finally:
+            self._alerts_in_flight.discard(session_id)
     
     def get_current_status(self) -> Dict:
         """Get current system status"""
@@ -336,29 +632,28 @@ class ParkingMonitor:
         return {
             'is_running': self.is_running,
             'camera_connected': self.camera is not None,
-            'slack_connected': self.slack.is_connected(),
+            'slack_connected': bool(self.slack and self.slack.is_connected()),
             'active_sessions': len(self.active_sessions),
-            'total_spots': len(Config.PARKING_SPOTS),
+            'total_spots': len(self._spots),
             'stats': stats
         }
     
     def get_active_sessions_data(self) -> List[Dict]:
         """Get data for all active sessions"""
-        sessions = []
-        for spot_id, session_data in self.active_sessions.items():
-            # Calculate current duration
-            start_time = datetime.fromisoformat(session_data['start_time'])
-            duration_hours = (datetime.now() - start_time).total_seconds() / 3600
-            
-            session_info = {
+        # Take one reference; the monitor thread swaps in a new dict on changes
+        active_sessions = self.active_sessions
+        now = datetime.now()
+        sessions = [
+            {
                 'spot_id': spot_id,
                 'spot_name': session_data['spot_name'],
                 'car_identifier': session_data['car_identifier'],
-                'start_time': session_data['start_time'],
-                'duration_hours': round(duration_hours, 2),
+                'start_time': session_data['start_time'].isoformat(),
+                'duration_hours': round((now - session_data['start_time']).total_seconds() / 3600, 2),
                 'confidence_score': session_data['confidence_score'],
                 'image_path': session_data['image_path']
             }
-            sessions.append(session_info)
+            for spot_id, session_data in active_sessions.items()
+        ]
         
         return sessions 
\ No newline at end of file
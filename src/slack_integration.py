@@ -1,4 +1,4 @@
-import os
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from typing import List, Dict, Optional
@@ -11,6 +11,12 @@ class SlackIntegration:
         self.client = None
         self.channel = Config.SLACK_CHANNEL
         self.alert_threshold = Config.SLACK_ALERT_THRESHOLD
+        # Async client for the monitor's network event loop, created there on first use
+        self._async_client = None
+        self._http_session = None
+        # Blocking sends run on worker threads; callers get a Future back
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='slack')
+        self._pending = set()
         
         if Config.SLACK_BOT_TOKEN:
             try:
@@ -24,32 +30,89 @@ class SlackIntegration:
         else:
             logging.warning("No Slack bot token provided. Slack integration disabled.")
     
-    def send_parking_alert(self, session_data: Dict, image_path: Optional[str] = None) -> bool:
-        """Send an alert for a car that has been parked too long"""
+    def _submit(self, fn, *args) -> Future:
+        """Run a blocking send on the worker threads"""
+        future = self._executor.submit(fn, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+    
+    def shutdown(self, timeout: float = 5):
+        """Wait up to timeout seconds for queued messages, then stop the worker threads"""
+        wait(list(self._pending), timeout=timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def send_parking_alert_async(self, session_data: Dict, image_path: Optional[str] = None) -> bool:
+        """Send an alert for a car that has been parked too long, on the monitor's event loop"""
         if not self.client:
             logging.warning("Slack client not available")
             return False
         
         try:
-            # Calculate hours parked
-            start_time = datetime.fromisoformat(session_data['start_time'])
-            hours_parked = (datetime.now() - start_time).total_seconds() / 3600
+            message = self._create_alert_message(session_data)
+            alert_jpeg = self._alert_image(session_data, image_path)
+            client = self._get_async_client()
+            
+            if alert_jpeg:
+                try:
+                    upload_response = await client.files_upload_v2(
+                        channel=self.channel,
+                        content=alert_jpeg,
+                        filename='alert.jpg',
+                        title="Parking Violation Image",
+                        initial_comment=message
+                    )
+                    logging.info(f"Slack message with image sent successfully: {upload_response['file']['id']}")
+                    return True
+                except Exception as e:
+                    # Fallback to text-only message
+                    logging.error(f"Error uploading image to Slack: {e}")
             
-            # Create message
-            message = self._create_alert_message(session_data, hours_parked)
+            response = await client.chat_postMessage(channel=self.channel, text=message, parse='mrkdwn')
+            logging.info(f"Slack message sent successfully: {response['ts']}")
+            return True
             
-            # Send message with or without image
-            if image_path and os.path.exists(image_path):
-                return self._send_message_with_image(message, image_path)
-            else:
-                return self._send_text_message(message)
-                
+        except SlackApiError as e:
+            logging.error(f"Failed to send Slack message: {e.response['error']}")
+            return False
         except Exception as e:
             logging.error(f"Failed to send Slack alert: {e}")
             return False
     
-    def _create_alert_message(self, session_data: Dict, hours_parked: float) -> str:
+    def _alert_image(self, session_data: Dict, image_path: Optional[str]) -> Optional[bytes]:
+        """Get the alert JPEG: the one encoded at detection time, else the saved spot image"""
+        if session_data.get('alert_jpeg'):
+            return session_data['alert_jpeg']
+        if image_path:
+            try:
+                with open(image_path, 'rb') as file:
+                    return file.read()
+            except FileNotFoundError:
+                logging.warning(f"Alert image {image_path} no longer exists, sending text only")
+        return None
+    
+    def _get_async_client(self):
+        """Create the async client on first use, inside the running event loop"""
+        if self._async_client is None:
+            import aiohttp
+            from slack_sdk.web.async_client import AsyncWebClient
+            self._http_session = aiohttp.ClientSession()
+            self._async_client = AsyncWebClient(token=Config.SLACK_BOT_TOKEN, session=self._http_session)
+        return self._async_client
+    
+    async def close_async(self):
+        """Close the async client's HTTP session"""
+        if self._http_session:
+            await self._http_session.close()
+            self._http_session = None
+            self._async_client = None
+    
+    def _create_alert_message(self, session_data: Dict) -> str:
         """Create the alert message text"""
+        start_time = session_data['start_time']
+        if isinstance(start_time, str):
+            start_time = datetime.fromisoformat(start_time)
+        hours_parked = (datetime.now() - start_time).total_seconds() / 3600
         spot_name = session_data.get('spot_name', f"Spot {session_data['spot_id']}")
         car_id = session_data.get('car_identifier', 'Unknown')
         
@@ -59,7 +122,7 @@ class SlackIntegration:
 *Location:* {spot_name}
 *Vehicle ID:* {car_id}
 *Time Parked:* {hours_parked:.1f} hours
-*Start Time:* {session_data['start_time']}
+*Start Time:* {start_time.strftime('%Y-%m-%d %H:%M:%S')}
 *Confidence:* {session_data.get('confidence_score', 0):.2f}
 
 This vehicle has been parked for over {self.alert_threshold} hours and may require attention.
@@ -81,31 +144,11 @@ This vehicle has been parked for over {self.alert_threshold} hours and may requi
             logging.error(f"Failed to send Slack message: {e.response['error']}")
             return False
     
-    def _send_message_with_image(self, message: str, image_path: str) -> bool:
-        """Send a message with an image attachment to Slack"""
-        try:
-            # Upload the image first
-            with open(image_path, 'rb') as file:
-                upload_response = self.client.files_upload_v2(
-                    channel=self.channel,
-                    file=file,
-                    title="Parking Violation Image",
-                    initial_comment=message
-                )
-            
-            logging.info(f"Slack message with image sent successfully: {upload_response['file']['id']}")
-            return True
-            
-        except SlackApiError as e:
-            logging.error(f"Failed to send Slack message with image: {e.response['error']}")
-            # Fallback to text-only message
-            return self._send_text_message(message)
-        except Exception as e:
-            logging.error(f"Error uploading image to Slack: {e}")
-            # Fallback to text-only message
-            return self._send_text_message(message)
+    def send_daily_report(self, stats: Dict) -> Future:
+        """Send a daily parking statistics report; the Future resolves to success"""
+        return self._submit(self._do_send_daily_report, stats)
     
-    def send_daily_report(self, stats: Dict) -> bool:
+    def _do_send_daily_report(self, stats: Dict) -> bool:
         """Send a daily parking statistics report"""
         if not self.client:
             return False
@@ -128,7 +171,11 @@ This vehicle has been parked for over {self.alert_threshold} hours and may requi
             logging.error(f"Failed to send daily report: {e}")
             return False
     
-    def send_system_status(self, status: str, details: str = "") -> bool:
+    def send_system_status(self, status: str, details: str = "") -> Future:
+        """Send system status updates; the Future resolves to success"""
+        return self._submit(self._do_send_system_status, status, details)
+    
+    def _do_send_system_status(self, status: str, details: str = "") -> bool:
         """Send system status updates"""
         if not self.client:
             return False
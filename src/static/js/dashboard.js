@@ -60,7 +60,7 @@ class ParkingDashboard {
             await this.loadStatus();
             await this.loadActiveSessions();
             await this.loadParkingStats();
-            await this.loadOccupancyChart();
+            this.loadOccupancyChart();
         } catch (error) {
             console.error('Error loading initial data:', error);
             this.showNotification('Error loading data', 'error');
@@ -104,17 +104,11 @@ class ParkingDashboard {
         }
     }
     
-    async loadOccupancyChart() {
-        try {
-            const response = await fetch('/api/occupancy-chart');
-            const data = await response.json();
-            
-            if (data.chart_data) {
-                document.getElementById('occupancyChart').src = 
-                    'data:image/png;base64,' + data.chart_data;
-            }
-        } catch (error) {
-            console.error('Error loading occupancy chart:', error);
+    loadOccupancyChart() {
+        // Point the image straight at the PNG endpoint; the timestamp forces a refresh
+        const occupancyChart = document.getElementById('occupancyChart');
+        if (occupancyChart) {
+            occupancyChart.src = '/api/occupancy-chart?t=' + Date.now();
         }
     }
     
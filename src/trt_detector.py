@@ -0,0 +1,150 @@
+import ctypes
+import json
+import cv2
+import numpy as np
+from typing import List, Tuple
+import tensorrt as trt
+from cuda import cudart
+
+
+def _check(result):
+    """Unwrap a cuda-python call result, raising on error"""
+    err, *values = result if isinstance(result, tuple) else (result,)
+    if err != cudart.cudaError_t.cudaSuccess:
+        raise RuntimeError(f"CUDA error: {err}")
+    return values[0] if len(values) == 1 else values
+
+
+class TRTDetector:
+    """Thin TensorRT runner for an exported YOLOv8 engine.
+
+    The execution context, CUDA stream and pinned host / device buffers are
+    allocated once and reused for every batch.
+    """
+
+    def __init__(self, engine_path: str, max_batch: int = 1,
+                 conf_threshold: float = 0.25, iou_threshold: float = 0.45):
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, 'rb') as f, trt.Runtime(logger) as runtime:
+            self.engine = runtime.deserialize_cuda_engine(self._read_engine(f))
+        if self.engine is None:
+            raise RuntimeError(f"Failed to deserialize TensorRT engine {engine_path}")
+        self.context = self.engine.create_execution_context()
+        self.stream = _check(cudart.cudaStreamCreate())
+
+        self.input_name = self.engine.get_tensor_name(0)
+        self.output_name = self.engine.get_tensor_name(1)
+        self.input_dtype = np.dtype(trt.nptype(self.engine.get_tensor_dtype(self.input_name)))
+        self.output_dtype = np.dtype(trt.nptype(self.engine.get_tensor_dtype(self.output_name)))
+        input_shape = self.engine.get_tensor_shape(self.input_name)
+        self.imgsz = input_shape[2]
+        # Dynamic engines report -1 for the batch dimension
+        self.dynamic_batch = input_shape[0] == -1
+        self.max_batch = max_batch if self.dynamic_batch else input_shape[0]
+
+        self.context.set_input_shape(self.input_name, (self.max_batch, 3, self.imgsz, self.imgsz))
+        output_shape = tuple(self.context.get_tensor_shape(self.output_name))
+
+        self.host_in, self.device_in = self._allocate((self.max_batch, 3, self.imgsz, self.imgsz), self.input_dtype)
+        self.host_out, self.device_out = self._allocate(output_shape, self.output_dtype)
+        self.context.set_tensor_address(self.input_name, self.device_in)
+        self.context.set_tensor_address(self.output_name, self.device_out)
+
+    @staticmethod
+    def _read_engine(f) -> bytes:
+        """Read a serialized engine, skipping the metadata header Ultralytics exports prepend"""
+        # Ultralytics writes a 4-byte little-endian length followed by that many bytes of JSON
+        header = f.read(4)
+        if len(header) == 4:
+            meta_len = int.from_bytes(header, byteorder='little', signed=True)
+            if 0 < meta_len < 1 << 20:
+                try:
+                    json.loads(f.read(meta_len).decode('utf-8'))
+                    return f.read()
+                except (UnicodeDecodeError, ValueError):
+                    pass
+        # Plain trtexec-style engine without a header
+        f.seek(0)
+        return f.read()
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> Tuple[np.ndarray, int]:
+        """Allocate a pinned host array of the tensor's dtype and a matching device buffer"""
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        host_ptr = _check(cudart.cudaMallocHost(nbytes))
+        raw = np.ctypeslib.as_array(ctypes.cast(host_ptr, ctypes.POINTER(ctypes.c_uint8)), shape=(nbytes,))
+        host = raw.view(dtype).reshape(shape)
+        device = _check(cudart.cudaMalloc(nbytes))
+        return host, device
+
+    def _letterbox_into(self, image: np.ndarray, index: int) -> Tuple[float, Tuple[int, int]]:
+        """Letterbox a BGR image into slot index of the pinned input buffer"""
+        h, w = image.shape[:2]
+        scale = self.imgsz / max(h, w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x = (self.imgsz - new_w) // 2
+        pad_y = (self.imgsz - new_h) // 2
+
+        resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+
+        slot = self.host_in[index]
+        slot.fill(114 / 255.0)
+        slot[:, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = rgb.transpose(2, 0, 1) / 255.0
+        return scale, (pad_x, pad_y)
+
+    def _decode(self, output: np.ndarray, scale: float, pad: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decode one (4 + classes, anchors) YOLOv8 output into xyxy, confidences and class IDs"""
+        predictions = output.T.astype(np.float32, copy=False)
+        class_scores = predictions[:, 4:]
+        classes = class_scores.argmax(axis=1)
+        confs = class_scores[np.arange(len(classes)), classes]
+        keep = confs >= self.conf_threshold
+        predictions, confs, classes = predictions[keep], confs[keep], classes[keep]
+
+        if len(predictions) == 0:
+            return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, int)
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        xyxy = (xyxy - np.array([pad[0], pad[1], pad[0], pad[1]])) / scale
+
+        boxes_xywh = np.stack([xyxy[:, 0], xyxy[:, 1], w / scale, h / scale], axis=1)
+        indices = cv2.dnn.NMSBoxesBatched(boxes_xywh.tolist(), confs.tolist(), classes.tolist(),
+                                          self.conf_threshold, self.iou_threshold)
+        indices = np.array(indices, dtype=int).reshape(-1)
+        return xyxy[indices], confs[indices], classes[indices]
+
+    def infer(self, images: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Run the engine on BGR images, returning (xyxy, conf, cls) per image in its own coordinates"""
+        outputs = []
+        for start in range(0, len(images), self.max_batch):
+            chunk = images[start:start + self.max_batch]
+            transforms = [self._letterbox_into(image, i) for i, image in enumerate(chunk)]
+
+            # Dynamic engines run only the rows in this chunk; static ones always run the full batch
+            rows = len(chunk) if self.dynamic_batch else self.max_batch
+            if self.dynamic_batch:
+                self.context.set_input_shape(self.input_name, (rows, 3, self.imgsz, self.imgsz))
+            nbytes_in = self.host_in[:rows].nbytes
+            nbytes_out = self.host_out[:rows].nbytes
+            _check(cudart.cudaMemcpyAsync(self.device_in, self.host_in.ctypes.data, nbytes_in,
+                                          cudart.cudaMemcpyKind.cudaMemcpyHostToDevice, self.stream))
+            self.context.execute_async_v3(self.stream)
+            _check(cudart.cudaMemcpyAsync(self.host_out.ctypes.data, self.device_out, nbytes_out,
+                                          cudart.cudaMemcpyKind.cudaMemcpyDeviceToHost, self.stream))
+            _check(cudart.cudaStreamSynchronize(self.stream))
+
+            for i, (scale, pad) in enumerate(transforms):
+                outputs.append(self._decode(self.host_out[i], scale, pad))
+        return outputs
+
+    def close(self):
+        """Release CUDA buffers and the stream"""
+        cudart.cudaFreeHost(self.host_in.ctypes.data)
+        cudart.cudaFreeHost(self.host_out.ctypes.data)
+        cudart.cudaFree(self.device_in)
+        cudart.cudaFree(self.device_out)
+        cudart.cudaStreamDestroy(self.stream)
@@ -1,35 +1,110 @@
 from flask import Flask, render_template, jsonify, Response, request
 from flask_socketio import SocketIO, emit
-from picamera2 import Picamera2
 import cv2
 import numpy as np
 import json
+import functools
+import hashlib
+import queue
 import threading
 import time
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import io
-import base64
+from contextlib import contextmanager
 from PIL import Image, ImageDraw, ImageFont
 from .config import Config
-from .parking_monitor import ParkingMonitor
 from .database import ParkingDatabase
 
+def _use_orjson(flask_app):
+    """Serialise jsonify() responses with orjson instead of the stdlib json module"""
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    class OrjsonProvider(DefaultJSONProvider):
+        # Keys are sorted like the default provider (sort_keys); orjson only indents by
+        # two spaces, so any indent passed to dumps() gets that, and responses stay compact
+        def _options(self, sort_keys: bool, indent=None) -> int:
+            option = options
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return option
+        
+        def dumps(self, obj, **kwargs):
+            option = self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+        
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=self.default, option=self._options(self.sort_keys))
+            return self._app.response_class(body, mimetype=self.mimetype)
+    
+    flask_app.json = OrjsonProvider(flask_app)
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'parking-enforcer-secret-key'
-socketio = SocketIO(app, cors_allowed_origins="*")
+if Config.USE_ORJSON:
+    _use_orjson(app)
+# Threading mode: the server runs beside the camera, detector and asyncio threads, which
+# eventlet/gevent monkey-patching would break, and Werkzeug serves each client on its own thread
+socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*")
 
 # Global parking monitor instance - will be set by main.py
 parking_monitor = None
-camera_frame = None
-frame_lock = threading.Lock()
+
+# Werkzeug serves each request on a new thread, so requests share one long-lived
+# read connection, separate from the monitor's writer, and take turns on it
+_database = None
+_database_lock = threading.Lock()
+
+# Spot configuration is static, so its JSON body and ETag are built once
+_PARKING_SPOTS_JSON = json.dumps(Config.PARKING_SPOTS, separators=(',', ':')).encode()
+_PARKING_SPOTS_ETAG = hashlib.md5(_PARKING_SPOTS_JSON).hexdigest()
+
+# Serialised /api/parking-stats responses by days: (expiry on the monotonic clock, body)
+STATS_CACHE_SECONDS = 30
+STATS_CACHE_MAX_ENTRIES = 16
+_stats_cache = {}
+
+# Last rendered occupancy chart: (expiry on the monotonic clock, PNG bytes)
+CHART_CACHE_SECONDS = 60
+_chart_cache = None
+
+# Latest preview JPEG as a ready-to-send multipart part, produced once by the encoder thread
+# from frames queued by update_camera_frame and shared by every stream.
+# camera_seq is bumped on every change so streams can wait on frame_cv for the next one
+camera_part = None
+camera_seq = 0
+frame_cv = threading.Condition()
+encode_queue = queue.Queue(maxsize=1)
+
+# Number of clients currently streaming /video_feed
+viewer_count = 0
+viewer_lock = threading.Lock()
+
+# Status is computed once per interval by the broadcaster and pushed to every
+# connected dashboard; on-demand requests get the last computed copy while it is
+# fresh. The broadcaster idles with no clients, so an older copy is recomputed
+socket_clients = 0
+socket_lock = threading.Lock()
+last_status = None
+last_status_at = float('-inf')  # time.monotonic() when last_status was computed
 
 def set_parking_monitor(monitor_instance):
     """Set the parking monitor instance from main.py"""
     global parking_monitor
     parking_monitor = monitor_instance
 
+@contextmanager
+def _db():
+    """Use the web interface's database connection, one request at a time"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = ParkingDatabase(shared=True)
+        yield _database
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -76,99 +151,258 @@ def stop_monitoring():
 @app.route('/api/parking-stats')
 def get_parking_stats():
     """Get parking statistics"""
-    db = ParkingDatabase()
     days = request.args.get('days', 7, type=int)
-    stats = db.get_parking_stats(days)
-    return jsonify(stats)
+    now = time.monotonic()
+    cached = _stats_cache.get(days)
+    if cached is None or cached[0] <= now:
+        # The stats move slowly, so recompute at most every STATS_CACHE_SECONDS per days value
+        if len(_stats_cache) >= STATS_CACHE_MAX_ENTRIES:
+            _stats_cache.clear()
+        with _db() as db:
+            stats = db.get_parking_stats(days)
+        cached = (now + STATS_CACHE_SECONDS, app.json.dumps(stats).encode())
+        _stats_cache[days] = cached
+    return Response(cached[1], mimetype='application/json')
+
+def _occupancy_chart_png() -> bytes:
+    """Render the last 24 hours of occupancy as PNG bytes, reusing a recent render"""
+    global _chart_cache
+    now = time.monotonic()
+    # Hourly points barely move between dashboard refreshes, so one render serves
+    # every request within CHART_CACHE_SECONDS
+    if _chart_cache is not None and _chart_cache[0] > now:
+        return _chart_cache[1]
+    
+    # Get data for the last 24 hours (hourly data), oldest first
+    with _db() as db:
+        data = db.get_hourly_occupancy(24)
+    
+    # Create chart
+    times = [time_point for time_point, _ in data]
+    occupancy = [rate for _, rate in data]
+    png = _render_line_chart(times, occupancy, 'Parking Occupancy - Last 24 Hours')
+    _chart_cache = (now + CHART_CACHE_SECONDS, png)
+    return png
 
 @app.route('/api/occupancy-chart')
 def get_occupancy_chart():
-    """Generate and return occupancy chart as base64 image"""
-    db = ParkingDatabase()
-    
-    # Get data for the last 24 hours (hourly data)
-    hours = 24
-    data = []
-    
-    for i in range(hours):
-        time_point = datetime.now() - timedelta(hours=i)
-        # This is a simplified version - in a real implementation, you'd query hourly data
-        # For now, we'll use current stats
-        stats = db.get_parking_stats(1)
-        data.append({
-            'time': time_point,
-            'occupancy': stats['occupancy_rate']
-        })
+    """Return the occupancy chart as a PNG image, usable directly as an <img> src"""
+    return Response(_occupancy_chart_png(), mimetype='image/png',
+                    headers={'Cache-Control': 'public, max-age=30'})
+
+@functools.lru_cache(maxsize=None)
+def _load_font(size: int):
+    """Load the DejaVu Sans Bold font at a size, falling back to Pillow's default"""
+    try:
+        return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+# Line chart layout: canvas size and plot-area margins (left, right, top, bottom)
+CHART_SIZE = (1000, 600)
+CHART_MARGINS = (80, 30, 70, 70)
+
+def _text_size(draw, text: str, font):
+    """Width and height of text as drawn with a font"""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+def _chart_y(value: float) -> float:
+    """Pixel row of a 0-100% value in the chart's plot area"""
+    _, _, top, bottom = CHART_MARGINS
+    plot_h = CHART_SIZE[1] - top - bottom
+    return top + plot_h - min(max(value, 0), 100) * plot_h / 100
+
+@functools.lru_cache(maxsize=4)
+def _chart_background(title: str) -> Image.Image:
+    """The data-independent part of a 0-100% line chart, drawn once per title"""
+    width, height = CHART_SIZE
+    left, right, top, bottom = CHART_MARGINS
+    plot_w = width - left - right
+    plot_h = height - top - bottom
     
-    # Create chart
-    plt.figure(figsize=(10, 6))
-    times = [d['time'] for d in reversed(data)]
-    occupancy = [d['occupancy'] for d in reversed(data)]
+    image = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(image)
+    font = _load_font(14)
     
-    plt.plot(times, occupancy, marker='o', linewidth=2, markersize=6)
-    plt.title('Parking Occupancy - Last 24 Hours', fontsize=14, fontweight='bold')
-    plt.xlabel('Time', fontsize=12)
-    plt.ylabel('Occupancy Rate (%)', fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.ylim(0, 100)
+    # Horizontal grid lines with percentage labels
+    for pct in range(0, 101, 20):
+        y = _chart_y(pct)
+        draw.line([(left, y), (left + plot_w, y)], fill='#e5e5e5')
+        label = str(pct)
+        label_w, label_h = _text_size(draw, label, font)
+        draw.text((left - 10 - label_w, y - label_h / 2), label, fill='black', font=font)
     
-    # Format x-axis
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=4))
-    plt.xticks(rotation=45)
+    # Axes
+    draw.line([(left, top), (left, top + plot_h), (left + plot_w, top + plot_h)], fill='black', width=1)
     
-    plt.tight_layout()
+    # Title and axis labels
+    title_font = _load_font(20)
+    title_w, _ = _text_size(draw, title, title_font)
+    draw.text(((width - title_w) / 2, 20), title, fill='black', font=title_font)
+    draw.text((left, top - 25), 'Occupancy Rate (%)', fill='black', font=font)
+    label_w, _ = _text_size(draw, 'Time', font)
+    draw.text((left + (plot_w - label_w) / 2, height - 30), 'Time', fill='black', font=font)
+    return image
+
+def _render_line_chart(times, values, title: str) -> bytes:
+    """Draw a 0-100% line chart of values over times with Pillow and return it as PNG bytes"""
+    left, right, top, bottom = CHART_MARGINS
+    plot_w = CHART_SIZE[0] - left - right
+    plot_h = CHART_SIZE[1] - top - bottom
     
-    # Convert to base64
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-    img_buffer.seek(0)
-    img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-    plt.close()
+    # Only the ticks and data are drawn per request, on a copy of the cached background
+    image = _chart_background(title).copy()
+    draw = ImageDraw.Draw(image)
+    font = _load_font(14)
     
-    return jsonify({'chart_data': img_base64})
+    # Data points, with an HH:MM tick every 4 hours
+    step = plot_w / (len(values) - 1) if len(values) > 1 else 0
+    points = [(left + i * step, _chart_y(value)) for i, value in enumerate(values)]
+    for (x, _), time_point in zip(points, times):
+        if time_point.hour % 4 == 0:
+            draw.line([(x, top + plot_h), (x, top + plot_h + 5)], fill='black')
+            label = time_point.strftime('%H:%M')
+            label_w, _ = _text_size(draw, label, font)
+            draw.text((x - label_w / 2, top + plot_h + 10), label, fill='black', font=font)
+    if len(points) > 1:
+        draw.line(points, fill='#1f77b4', width=2)
+    for x, y in points:
+        draw.ellipse([(x - 4, y - 4), (x + 4, y + 4)], fill='#1f77b4')
+    
+    # Low zlib effort: the flat chart compresses well either way and encodes much faster
+    img_buffer = io.BytesIO()
+    image.save(img_buffer, format='PNG', compress_level=1)
+    return img_buffer.getvalue()
 
 @app.route('/api/parking-spots')
 def get_parking_spots():
     """Get parking spot configuration"""
-    return jsonify(Config.PARKING_SPOTS)
+    response = Response(_PARKING_SPOTS_JSON, mimetype='application/json')
+    response.set_etag(_PARKING_SPOTS_ETAG)
+    # Answers 304 Not Modified when the browser already has this version
+    return response.make_conditional(request)
 
 @app.route('/video_feed')
 def video_feed():
     """Video streaming route"""
     def generate_frames():
-        global camera_frame
+        global viewer_count
+        
+        with viewer_lock:
+            viewer_count += 1
+        last_seq = -1
+        try:
+            while True:
+                # Sleep until a new frame is published; the timeout re-sends the current
+                # one (or the fallback image) so idle streams stay alive
+                with frame_cv:
+                    frame_cv.wait_for(lambda: camera_seq != last_seq, timeout=1.0)
+                    part = camera_part
+                    last_seq = camera_seq
+                
+                if part is None:
+                    # Show the fallback image when no camera frame is available
+                    part = _fallback_part()
+                
+                yield part
+        finally:
+            with viewer_lock:
+                viewer_count -= 1
+    
+    response = Response(generate_frames(), 
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Hand the parts straight to the server, and keep browsers and reverse proxies
+    # from caching or buffering the stream
+    response.direct_passthrough = True
+    response.headers['Cache-Control'] = 'no-cache, private'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def has_viewer() -> bool:
+    """Check whether any client is watching the video feed"""
+    return viewer_count > 0
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n'
+
+def _mjpeg_part(jpeg, timestamp: float = None) -> bytes:
+    """Wrap JPEG bytes (or any buffer) as one part of the multipart/x-mixed-replace stream,
+    with an X-Timestamp header (capture time, Unix seconds) when one is given"""
+    stamp = f'X-Timestamp: {timestamp:.6f}\r\n'.encode() if timestamp is not None else b''
+    # One join allocates the part once, without the intermediate a + b + c builds
+    return b''.join((MJPEG_PART_HEADER, stamp, b'\r\n', jpeg, b'\r\n'))
+
+def _make_jpeg_encoder():
+    """Return a function encoding a BGR frame to a JPEG buffer (None on failure)"""
+    # All encoders default to baseline 4:2:0 without the Huffman optimize pass
+    quality = Config.STREAM_JPEG_QUALITY
+    if Config.USE_SIMPLEJPEG:
+        import simplejpeg
         
-        while True:
-            with frame_lock:
-                if camera_frame is not None:
-                    # Convert numpy array to PIL Image and encode
-                    # Handle RGBA frames by converting to RGB
-                    if camera_frame.shape[2] == 4:  # RGBA
-                        # Convert RGBA to RGB by dropping alpha channel
-                        rgb_frame = camera_frame[:, :, :3]
-                        pil_image = Image.fromarray(rgb_frame)
-                    else:
-                        pil_image = Image.fromarray(camera_frame)
-                    
-                    img_buffer = io.BytesIO()
-                    pil_image.save(img_buffer, format='JPEG', quality=85)
-                    frame_data = img_buffer.getvalue()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
+        def encode(frame):
+            return simplejpeg.encode_jpeg(frame, quality=quality, colorspace='BGR', fastdct=True)
+        return encode
+    
+    if Config.USE_TURBOJPEG:
+        try:
+            from turbojpeg import TurboJPEG, TJPF_BGR
+            jpeg = TurboJPEG()  # Loads the system libturbojpeg
+        except (ImportError, OSError, RuntimeError) as e:
+            print(f"TurboJPEG not available, using OpenCV for the live view: {e}")
+        else:
+            def encode(frame):
+                return jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+            return encode
+    
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    
+    def encode(frame):
+        ok, buf = cv2.imencode('.jpg', frame, params)
+        # The encoded array is joined into the part directly, with no tobytes() copy
+        return buf if ok else None
+    return encode
+
+def _encoder_loop():
+    """Encode queued preview frames to JPEG off the capture thread"""
+    global camera_part, camera_seq
+    use_umat = Config.USE_OPENCL and cv2.ocl.haveOpenCL()
+    encode = _make_jpeg_encoder()
+    preview_frame = None  # Reused destination for the downscaled preview
+    while True:
+        timestamp, frame, release = encode_queue.get()
+        source = frame
+        try:
+            # Downscale for the preview only; detection keeps the full-resolution frame
+            h, w = frame.shape[:2]
+            if w > Config.PREVIEW_MAX_WIDTH:
+                size = (Config.PREVIEW_MAX_WIDTH, h * Config.PREVIEW_MAX_WIDTH // w)
+                if use_umat:
+                    # Resize through OpenCL and read back only the small image
+                    frame = cv2.resize(cv2.UMat(frame), size, interpolation=cv2.INTER_AREA).get()
                 else:
-                    # Create a fallback image when no camera frame is available
-                    fallback_image = create_fallback_image()
-                    img_buffer = io.BytesIO()
-                    fallback_image.save(img_buffer, format='JPEG', quality=85)
-                    frame_data = img_buffer.getvalue()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
+                    if preview_frame is None or preview_frame.shape[:2] != (size[1], size[0]):
+                        preview_frame = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                    frame = cv2.resize(frame, size, dst=preview_frame, interpolation=cv2.INTER_AREA)
             
-            time.sleep(0.1)  # 10 FPS
-    
-    return Response(generate_frames(), 
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+            frame_data = encode(frame)
+        finally:
+            if release:
+                release(source)
+        if frame_data is not None:
+            # Frame the part here so streams send the shared bytes without concatenating
+            part = _mjpeg_part(frame_data, timestamp)
+            with frame_cv:
+                camera_part = part
+                camera_seq += 1
+                frame_cv.notify_all()
+
+@functools.lru_cache(maxsize=None)
+def _fallback_part() -> bytes:
+    """The fallback image as a multipart part, drawn and encoded once on first use"""
+    # Encode with OpenCV like the live frames; Pillow draws in RGB, OpenCV expects BGR
+    image = cv2.cvtColor(np.asarray(create_fallback_image()), cv2.COLOR_RGB2BGR)
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return _mjpeg_part(buf)
 
 def create_fallback_image():
     """Create a fallback image when camera is not available"""
@@ -180,10 +414,7 @@ def create_fallback_image():
     draw = ImageDraw.Draw(image)
     
     # Try to use a default font, fallback to basic if not available
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-    except:
-        font = ImageFont.load_default()
+    font = _load_font(24)
     
     # Center the text
     text = "Camera Not Available"
@@ -213,29 +444,78 @@ def create_fallback_image():
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
+    global socket_clients
+    with socket_lock:
+        socket_clients += 1
     print('Client connected')
     emit('status', {'message': 'Connected to parking monitor'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle WebSocket disconnection"""
+    global socket_clients
+    with socket_lock:
+        socket_clients -= 1
     print('Client disconnected')
 
 @socketio.on('request_status')
 def handle_status_request():
     """Handle status request from client"""
+    global last_status, last_status_at
     if parking_monitor:
-        status = parking_monitor.get_current_status()
-        emit('status_update', status)
+        if time.monotonic() - last_status_at >= Config.STATUS_BROADCAST_INTERVAL:
+            last_status = parking_monitor.get_current_status()
+            last_status_at = time.monotonic()
+        emit('status_update', last_status)
 
-def update_camera_frame(frame):
-    """Update the global camera frame for web streaming"""
-    global camera_frame
-    with frame_lock:
-        camera_frame = frame.copy()
+def _status_broadcaster():
+    """Compute the status once per interval and push it to all connected clients"""
+    global last_status, last_status_at
+    while True:
+        socketio.sleep(Config.STATUS_BROADCAST_INTERVAL)
+        if not parking_monitor or socket_clients == 0:
+            continue
+        try:
+            last_status = parking_monitor.get_current_status()
+            last_status_at = time.monotonic()
+            socketio.emit('status_update', last_status)
+        except Exception as e:
+            print(f"Status broadcast failed: {e}")
+
+def update_camera_frame(frame, timestamp: float = None, release=None):
+    """Queue a frame for encoding and web streaming, or None to show the fallback image.
+    timestamp is the capture time in Unix seconds (now if not given). The frame is only
+    read, never copied; release(frame) is called once the encoder is done with it or it
+    is dropped, and until then the caller must not reuse it"""
+    global camera_part, camera_seq
+    if frame is None:
+        with frame_cv:
+            camera_part = None
+            camera_seq += 1
+            frame_cv.notify_all()
+        return
+    
+    # Stamp on arrival so clients can tell how old each streamed frame is
+    if timestamp is None:
+        timestamp = time.time()
+    
+    # Keep only the newest frame, handing a dropped one straight back to its owner
+    while True:
+        try:
+            encode_queue.put_nowait((timestamp, frame, release))
+            return
+        except queue.Full:
+            try:
+                _, dropped, dropped_release = encode_queue.get_nowait()
+            except queue.Empty:
+                continue
+            if dropped_release:
+                dropped_release(dropped)
 
 def start_web_server():
     """Start the Flask web server"""
+    threading.Thread(target=_encoder_loop, daemon=True).start()
+    socketio.start_background_task(_status_broadcaster)
     socketio.run(app, 
                 host=Config.WEB_HOST, 
                 port=Config.WEB_PORT, 